@@ -0,0 +1,8 @@
+"""Bộ benchmark và kiểm thử tải chạy offline.
+
+  bench_parsers   tốc độ các hàm phân tích HTML của scraper.py (so với bản BeautifulSoup cũ)
+  bench_sheets    tra cứu CCCD (_search_one_sheet) trên sheet 1k - 500k dòng
+  load_test       p50/p95/p99, throughput và bộ nhớ của từng endpoint trong src/main.py
+  fake_site       bản sao cục bộ của govolunteerhcmc.vn dựng từ fixtures/
+  fake_sheets     bản giả lập Google Sheets API trong bộ nhớ
+"""
@@ -0,0 +1,75 @@
+"""Đo tốc độ các hàm phân tích HTML của scraper.py trên các trang HTML mẫu đã lưu.
+
+Với mỗi trang trong benchmarks/fixtures/, kiểm tra bản lxml/XPath hiện tại cho
+kết quả giống hệt bản BeautifulSoup cũ (benchmarks/soup_parsers.py), rồi so
+thời gian chạy.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_parsers [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+import scraper
+from benchmarks import soup_parsers
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# (tên file mẫu, hàm mới, hàm cũ, tham số thêm)
+CASES = [
+    ("news_1.html", scraper._parse_news_page, soup_parsers.parse_news_page, ()),
+    ("news_2.html", scraper._parse_news_page, soup_parsers.parse_news_page, ()),
+    ("clubs.html", scraper._parse_clubs, soup_parsers.parse_clubs, ()),
+    ("skills.html", scraper._parse_generic_page, soup_parsers.parse_generic_page, (".elementor-1181",)),
+    ("ideas.html", scraper._parse_generic_page, soup_parsers.parse_generic_page, (".elementor-1242",)),
+    ("chuong_trinh_chien_dich_du_an.html", scraper._parse_generic_page,
+     soup_parsers.parse_generic_page, (".elementor-1165",)),
+    ("article.html", scraper._parse_article, soup_parsers.parse_article, ()),
+]
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def best_of(fn, args, repeat: int) -> float:
+    """Thời gian nhỏ nhất (giây) của một lần gọi trong `repeat` lần chạy."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    mismatches = 0
+    total_new = total_old = 0.0
+    print(f"{'fixture':<38}{'KB':>6}{'soup ms':>10}{'lxml ms':>10}{'speedup':>9}")
+    for name, new_fn, old_fn, extra in CASES:
+        html = load_fixture(name)
+        call_args = (html,) + extra
+        if new_fn(*call_args) != old_fn(*call_args):
+            mismatches += 1
+            print(f"❌ Kết quả khác nhau: {name}", file=sys.stderr)
+
+        old_time = best_of(old_fn, call_args, args.repeat)
+        new_time = best_of(new_fn, call_args, args.repeat)
+        total_old += old_time
+        total_new += new_time
+        print(f"{name:<38}{len(html.encode()) // 1024:>6}{old_time * 1000:>10.2f}"
+              f"{new_time * 1000:>10.2f}{old_time / new_time:>8.1f}x")
+
+    print(f"{'TOTAL':<44}{total_old * 1000:>10.2f}{total_new * 1000:>10.2f}{total_old / total_new:>8.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Micro-benchmark tra cứu CCCD (_search_one_sheet) trên sheet giả với nhiều kích thước.
+
+So sánh:
+  scan      cách cũ: tải toàn bộ sheet và duyệt từng dòng cho mỗi lần tra cứu
+  cold      lần tra cứu đầu tiên, gồm cả việc dựng chỉ mục CCCD
+  warm      tra cứu từ chỉ mục đã có trong bộ nhớ
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_sheets [--rows 1000 10000 100000 500000] [--lookups 2000]
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.fake_sheets import FakeSheetsBackend, cccd_for
+from src import sheets_utils
+
+SPREADSHEET_ID = "bench"
+
+
+def legacy_scan(sheet_api, spreadsheet_id: str, citizen_id: str):
+    """Cách tra cứu trước khi có chỉ mục: đọc cả sheet, duyệt tuyến tính."""
+    values = sheet_api.values().get(spreadsheetId=spreadsheet_id, range=sheets_utils.SHEET_NAME).execute()
+    values = values.get("values", [])
+    headers = values[0]
+    cccd_index = headers.index("CCCD")
+    for row in values[1:]:
+        if len(row) > cccd_index and row[cccd_index].strip() == citizen_id.strip():
+            return {headers[i]: (row[i] if i < len(row) else "") for i in range(len(headers))}
+    return None
+
+
+def run(rows: int, lookups: int):
+    backend = FakeSheetsBackend(rows=rows)
+    api = backend.spreadsheets()
+    backend.sheet(SPREADSHEET_ID)
+    ids = [cccd_for(random.randint(1, rows)) for _ in range(lookups)]
+
+    scan_lookups = max(5, min(lookups, 2_000_000 // rows))
+    start = time.perf_counter()
+    for citizen_id in ids[:scan_lookups]:
+        legacy_scan(api, SPREADSHEET_ID, citizen_id)
+    scan = (time.perf_counter() - start) / scan_lookups
+
+    # Chỉ mục riêng trong bộ nhớ: không nhận bản của lần chạy trước từ cache dùng chung.
+    sheets_utils._sheet_indexes[SPREADSHEET_ID] = sheets_utils.SheetIndex(SPREADSHEET_ID)
+    start = time.perf_counter()
+    first = sheets_utils._search_one_sheet(api, SPREADSHEET_ID, ids[0])
+    cold = time.perf_counter() - start
+    assert first == legacy_scan(api, SPREADSHEET_ID, ids[0])
+
+    reads_before = backend.counters["reads"]
+    start = time.perf_counter()
+    for citizen_id in ids:
+        sheets_utils._search_one_sheet(api, SPREADSHEET_ID, citizen_id)
+    warm = (time.perf_counter() - start) / lookups
+    extra_reads = backend.counters["reads"] - reads_before
+
+    print(f"{rows:>9}{scan * 1000:>12.3f}{cold * 1000:>12.2f}{warm * 1e6:>12.2f}"
+          f"{scan / warm:>12.0f}x{extra_reads:>8}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    # Sheet giả không có modifiedTime trên Drive: chỉ làm mới theo TTL.
+    sheets_utils._modified_time_supported = False
+    random.seed(1)
+    print(f"{'rows':>9}{'scan ms':>12}{'cold ms':>12}{'warm µs':>12}{'speedup':>13}{'reads':>8}")
+    for rows in args.rows:
+        run(rows, args.lookups)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Bản giả lập Google Sheets API (get, values().get/batchGet/update/batchUpdate) chạy trong bộ nhớ.
+
+Dùng thay cho resource `spreadsheets()` thật để đo hiệu năng mà không tốn
+quota: số dòng và độ trễ mỗi lần gọi đều cấu hình được.
+"""
+import re
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# Như Sheets thật: lưới mặc định có 1000 dòng, kể cả khi dữ liệu ít hơn.
+GRID_MIN_ROWS = 1000
+HEADERS = ["STT", "User_Name", "CCCD", "Email", "Hoạt động", "Ngày", "PDF_Requested"]
+ACTIVITIES = ["Mùa hè xanh", "Hiến máu nhân đạo", "Xuân tình nguyện", "Tiếp sức mùa thi", "Chủ nhật xanh"]
+
+_A1 = re.compile(r"^(?:(?P<c1>[A-Z]+)?(?P<r1>\d+)?)(?::(?:(?P<c2>[A-Z]+)?(?P<r2>\d+)?))?$")
+
+
+def cccd_for(i: int) -> str:
+    return f"{79_000_000_000 + i:012d}"
+
+
+def generate_rows(rows: int) -> List[List[str]]:
+    values = [list(HEADERS)]
+    for i in range(1, rows + 1):
+        # Mỗi 50 dòng có một người tham gia hai hoạt động (trùng CCCD với dòng trước).
+        person = i - 1 if i % 50 == 0 else i
+        row = [str(i), f"Tình nguyện viên {person}", cccd_for(person), "",
+               ACTIVITIES[i % len(ACTIVITIES)], f"{i % 28 + 1:02d}/{i % 12 + 1:02d}/2024"]
+        if i % 3:
+            row.append("FALSE")  # Sheets bỏ các ô trống ở cuối dòng.
+        values.append(row)
+    return values
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def parse_range(a1: str) -> Tuple[int, int, int, int]:
+    """'Sheet1!B2:C10' -> (dòng đầu, dòng cuối, cột đầu, cột cuối), 0-based, cuối là loại trừ."""
+    _, _, ref = a1.partition("!")
+    match = _A1.match(ref)
+    if not ref or not match:
+        return 0, 10 ** 9, 0, 10 ** 9
+    c1, r1, c2, r2 = match.group("c1"), match.group("r1"), match.group("c2"), match.group("r2")
+    single = ":" not in ref
+    row_start = int(r1) - 1 if r1 else 0
+    col_start = _column_index(c1) if c1 else 0
+    if single:
+        return row_start, (row_start + 1 if r1 else 10 ** 9), col_start, (col_start + 1 if c1 else 10 ** 9)
+    row_end = int(r2) if r2 else 10 ** 9
+    col_end = _column_index(c2) + 1 if c2 else 10 ** 9
+    return row_start, row_end, col_start, col_end
+
+
+class _Request:
+    def __init__(self, backend: "FakeSheetsBackend", fn, *args):
+        self._backend = backend
+        self._fn = fn
+        self._args = args
+
+    def execute(self, **kwargs):
+        if self._backend.latency_seconds:
+            time.sleep(self._backend.latency_seconds)
+        return self._fn(*self._args)
+
+
+class _Values:
+    def __init__(self, backend: "FakeSheetsBackend"):
+        self._backend = backend
+
+    def get(self, spreadsheetId: str, range: str, **kwargs):
+        return _Request(self._backend, self._backend.read, spreadsheetId, range)
+
+    def batchGet(self, spreadsheetId: str, ranges: List[str], **kwargs):
+        return _Request(self._backend, self._backend.batch_read, spreadsheetId, ranges)
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: dict, **kwargs):
+        return _Request(self._backend, self._backend.write, spreadsheetId, [{"range": range, **body}])
+
+    def batchUpdate(self, spreadsheetId: str, body: dict, **kwargs):
+        return _Request(self._backend, self._backend.write, spreadsheetId, body["data"])
+
+
+class _Spreadsheets:
+    def __init__(self, backend: "FakeSheetsBackend"):
+        self._backend = backend
+        self._values = _Values(backend)
+
+    def values(self):
+        return self._values
+
+    def get(self, spreadsheetId: str, **kwargs):
+        return _Request(self._backend, self._backend.properties, spreadsheetId)
+
+
+class FakeSheetsBackend:
+    """Các spreadsheet giả, mỗi cái `rows` dòng dữ liệu, mỗi lần gọi trễ `latency_ms`."""
+
+    def __init__(self, rows: int = 1000, latency_ms: float = 0):
+        self.rows = rows
+        self.latency_seconds = latency_ms / 1000
+        self.counters = {"reads": 0, "writes": 0, "cells_read": 0}
+        self._sheets: Dict[str, List[List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def sheet(self, spreadsheet_id: str) -> List[List[str]]:
+        with self._lock:
+            if spreadsheet_id not in self._sheets:
+                self._sheets[spreadsheet_id] = generate_rows(self.rows)
+            return self._sheets[spreadsheet_id]
+
+    def spreadsheets(self) -> _Spreadsheets:
+        return _Spreadsheets(self)
+
+    def _slice(self, spreadsheet_id: str, a1: str) -> dict:
+        row_start, row_end, col_start, col_end = parse_range(a1)
+        values = [row[col_start:col_end] for row in self.sheet(spreadsheet_id)[row_start:row_end]]
+        while values and not values[-1]:
+            values.pop()
+        with self._lock:
+            self.counters["cells_read"] += sum(len(row) for row in values)
+        result = {"range": a1, "majorDimension": "ROWS"}
+        if values:
+            result["values"] = values
+        return result
+
+    def properties(self, spreadsheet_id: str) -> dict:
+        row_count = max(GRID_MIN_ROWS, len(self.sheet(spreadsheet_id)))
+        return {"sheets": [{"properties": {"title": "Sheet1", "gridProperties": {"rowCount": row_count}}}]}
+
+    def read(self, spreadsheet_id: str, a1: str) -> dict:
+        with self._lock:
+            self.counters["reads"] += 1
+        return self._slice(spreadsheet_id, a1)
+
+    def batch_read(self, spreadsheet_id: str, ranges: List[str]) -> dict:
+        with self._lock:
+            self.counters["reads"] += 1
+        return {"spreadsheetId": spreadsheet_id, "valueRanges": [self._slice(spreadsheet_id, r) for r in ranges]}
+
+    def write(self, spreadsheet_id: str, data: List[dict]) -> dict:
+        sheet = self.sheet(spreadsheet_id)
+        with self._lock:
+            self.counters["writes"] += 1
+            for item in data:
+                row_start, _, col_start, _ = parse_range(item["range"])
+                for r, row_values in enumerate(item["values"]):
+                    while len(sheet) <= row_start + r:
+                        sheet.append([])
+                    row = sheet[row_start + r]
+                    for c, value in enumerate(row_values):
+                        while len(row) <= col_start + c:
+                            row.append("")
+                        row[col_start + c] = value
+        return {"totalUpdatedCells": sum(len(v) for item in data for v in item["values"])}
@@ -0,0 +1,125 @@
+"""Bản sao cục bộ của govolunteerhcmc.vn, phục vụ các trang HTML mẫu trong benchmarks/fixtures/.
+
+  /news/, /news/N/          news_1.html, news_2.html (link bài viết đổi theo N)
+  /clubs/, /skills/, /ideas/, /chuong-trinh-chien-dich-du-an/
+  mọi đường dẫn khác        article.html
+
+Mọi link tuyệt đối tới site thật được đổi sang địa chỉ của server này. Có hỗ
+trợ ETag/If-None-Match để đo cả đường conditional GET, và giả lập sự cố (fail_status)
+để đo circuit breaker/fallback.
+
+Chạy riêng:  python -m benchmarks.fake_site --port 8765 --pages 20 --latency-ms 50
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+REAL_BASE_URL = "https://govolunteerhcmc.vn"
+
+PAGES = {
+    "/clubs/": "clubs.html",
+    "/skills/": "skills.html",
+    "/ideas/": "ideas.html",
+    "/chuong-trinh-chien-dich-du-an/": "chuong_trinh_chien_dich_du_an.html",
+}
+
+
+class FakeSite:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, news_pages: int = 10, latency_ms: float = 0,
+                 fail_status: int = 0):
+        self.news_pages = news_pages
+        self.latency_seconds = latency_ms / 1000
+        # Khác 0: mọi request nhận mã lỗi này (vd. 503), có thể đổi lúc đang chạy.
+        self.fail_status = fail_status
+        self.hits = 0
+        self._fixtures = {}
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site.hits += 1
+                if site.latency_seconds:
+                    time.sleep(site.latency_seconds)
+                if site.fail_status:
+                    self.send_response(site.fail_status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = site.render(self.path.split("?", 1)[0])
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+
+    def _fixture(self, name: str) -> str:
+        if name not in self._fixtures:
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                self._fixtures[name] = f.read().replace(REAL_BASE_URL, self.base_url)
+        return self._fixtures[name]
+
+    def render(self, path: str):
+        if path in PAGES:
+            return self._fixture(PAGES[path]).encode("utf-8")
+        if path == "/news/" or path.startswith("/news/"):
+            parts = [p for p in path.split("/") if p]
+            page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+            if page > self.news_pages:
+                return None
+            html = self._fixture("news_1.html" if page == 1 else "news_2.html")
+            html = html.replace('data-max-page="6"', f'data-max-page="{self.news_pages}"')
+            if page > 2:
+                html = html.replace(f"{self.base_url}/bai-viet-", f"{self.base_url}/bai-viet-p{page}-")
+            return html.encode("utf-8")
+        return self._fixture("article.html").encode("utf-8")
+
+    def start(self) -> "FakeSite":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy bản sao cục bộ của govolunteerhcmc.vn.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=10, help="số trang /news/N/")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail-status", type=int, default=0, help="trả mã lỗi này cho mọi request")
+    args = parser.parse_args()
+    site = FakeSite(port=args.port, news_pages=args.pages, latency_ms=args.latency_ms,
+                    fail_status=args.fail_status)
+    print(f"🌐 Fake site: {site.base_url}  (GOVOLUNTEER_BASE_URL={site.base_url})")
+    site.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Kiểm thử tải toàn bộ API (src/main.py) hoàn toàn offline.
+
+Dựng fake_site.FakeSite thay cho govolunteerhcmc.vn và fake_sheets.FakeSheetsBackend
+thay cho Google Sheets, chạy app bằng uvicorn trong cùng tiến trình, rồi bắn
+request đồng thời vào từng endpoint. Với mỗi endpoint in ra: thời gian của
+request đầu tiên (cold), p50/p95/p99, throughput, số lỗi và RSS của tiến trình.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.load_test --rows 100000 --sheets-latency-ms 80 \\
+        --site-latency-ms 30 --concurrency 50 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_sheets import FakeSheetsBackend, cccd_for
+from benchmarks.fake_site import FakeSite
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def scenarios(site_url: str, rows: int):
+    """(tên, hàm sinh request theo số thứ tự i, hệ số số lượng request)."""
+    def cccd():
+        # Dòng thứ 50, 100, ... trùng CCCD với dòng trước nên không có CCCD riêng.
+        n = random.randint(1, rows)
+        return cccd_for(n - 1 if n % 50 == 0 else n)
+
+    return [
+        ("GET /", lambda i: ("GET", "/", None), 1),
+        ("GET /news", lambda i: ("GET", "/news", None), 1),
+        ("GET /clubs", lambda i: ("GET", "/clubs", None), 1),
+        ("GET /skills", lambda i: ("GET", "/skills", None), 1),
+        ("GET /ideas", lambda i: ("GET", "/ideas", None), 1),
+        ("GET /chuong-trinh-...", lambda i: ("GET", "/chuong-trinh-chien-dich-du-an", None), 1),
+        ("GET /article", lambda i: ("GET", f"/article?url={site_url}/bai-viet-{i % 50}/", None), 1),
+        ("POST /find-activities", lambda i: ("POST", "/find-activities", {"citizenId": cccd()}), 1),
+        ("POST /find-certificates", lambda i: ("POST", "/find-certificates", {"citizenId": cccd()}), 1),
+        ("POST /request-pdf", lambda i: ("POST", "/request-pdf",
+                                         {"citizenId": cccd(), "email": f"tnv{i}@example.com"}), 1),
+        ("POST /batch-lookup", lambda i: ("POST", "/batch-lookup",
+                                          {"citizenIds": [cccd() for _ in range(1000)]}), 0.1),
+        ("GET /all-data", lambda i: ("GET", "/all-data", None), 0.05),
+        ("GET /all-data ndjson", lambda i: ("GET", "/all-data?format=ndjson&fields=CCCD,Email", None), 0.05),
+        ("GET /all-data page", lambda i: ("GET", f"/all-data?sheet=activities&offset={i * 100 % rows}&limit=100", None), 1),
+    ]
+
+
+async def drive(client, make_request, total: int, concurrency: int):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, body = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+async def run_load(base_url: str, site_url: str, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        print(f"{'endpoint':<26}{'cold ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'req/s':>9}{'err':>6}{'RSS MB':>9}")
+        for name, make_request, factor in scenarios(site_url, args.rows):
+            if args.only and not any(part in name for part in args.only):
+                continue
+            method, path, body = make_request(0)
+            start = time.perf_counter()
+            await client.request(method, path, json=body)
+            cold = time.perf_counter() - start
+
+            total = max(5, int(args.requests * factor))
+            concurrency = max(1, min(args.concurrency, total))
+            latencies, errors, elapsed = await drive(client, make_request, total, concurrency)
+            p50, p95, p99 = percentiles(latencies)
+            print(f"{name:<26}{cold * 1000:>9.1f}{p50 * 1000:>9.1f}{p95 * 1000:>9.1f}{p99 * 1000:>9.1f}"
+                  f"{total / elapsed:>9.0f}{errors:>6}{rss_mb():>9.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000, help="số dòng mỗi sheet giả (1k - 500k)")
+    parser.add_argument("--sheets-latency-ms", type=float, default=50)
+    parser.add_argument("--site-latency-ms", type=float, default=20)
+    parser.add_argument("--news-pages", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="số request cho mỗi endpoint")
+    parser.add_argument("--only", nargs="*", help="chỉ chạy các endpoint có tên chứa chuỗi này")
+    args = parser.parse_args(argv)
+
+    site = FakeSite(news_pages=args.news_pages, latency_ms=args.site_latency_ms).start()
+    backend = FakeSheetsBackend(rows=args.rows, latency_ms=args.sheets_latency_ms)
+
+    # Phải đặt trước khi import scraper/src.main.
+    os.environ["GOVOLUNTEER_BASE_URL"] = site.base_url
+    os.environ.setdefault("SCRAPER_CACHE_DIR", tempfile.mkdtemp(prefix="govolunteer-bench-"))
+    import uvicorn
+    from src import main as app_module
+    from src import sheets_utils
+
+    fake_api = backend.spreadsheets()
+    sheets_utils.get_sheet_api = lambda scopes: fake_api
+    app_module.get_sheet_api = sheets_utils.get_sheet_api
+    sheets_utils._modified_time_supported = False
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f"🌐 Fake site {site.base_url} ({args.news_pages} trang /news), "
+          f"sheet giả {args.rows} dòng, trễ Sheets {args.sheets_latency_ms} ms, trễ site {args.site_latency_ms} ms")
+    try:
+        asyncio.run(run_load(f"http://127.0.0.1:{port}", site.base_url, args))
+    finally:
+        server.should_exit = True
+        site.stop()
+    print(f"📊 Site: {site.hits} request; Sheets: {backend.counters}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Bản phân tích HTML bằng BeautifulSoup trước khi scraper.py chuyển sang lxml/XPath.
+
+Giữ lại làm chuẩn đối chiếu: bench_parsers.py kiểm tra bản lxml cho kết quả
+giống hệt các hàm dưới đây rồi mới so tốc độ.
+"""
+from bs4 import BeautifulSoup
+
+from scraper import get_high_res_image_url, FALLBACK_IMAGE_URL
+
+def parse_generic_page(html: str, container_selector: str):
+    """Phân tích trang có cấu trúc section > h2 > article; None nếu không thấy container."""
+    soup = BeautifulSoup(html, "lxml")
+    sections_data = []
+    page_container = soup.select_one(container_selector)
+    if not page_container:
+        return None
+
+    for sec in page_container.select("section.elementor-top-section"):
+        h2 = sec.select_one("h2.elementor-heading-title")
+        if not h2 or not h2.text.strip():
+            continue
+        category_name = h2.text.strip()
+        
+        articles = []
+        for post in sec.select("article.elementor-post"):
+            a_tag = post.select_one("h3.elementor-post__title a")
+            if not a_tag or not a_tag.get('href'):
+                continue
+
+            img_tag = post.select_one(".elementor-post__thumbnail img")
+            image_url = FALLBACK_IMAGE_URL
+            if img_tag:
+                src = img_tag.get('src') or img_tag.get('data-src')
+                if src:
+                    image_url = get_high_res_image_url(src)
+
+            excerpt_tag = post.select_one(".elementor-post__excerpt p")
+            excerpt = excerpt_tag.text.strip() if excerpt_tag else "Không có mô tả."
+            
+            articles.append({
+                "title": a_tag.text.strip(),
+                "link": a_tag['href'],
+                "imageUrl": image_url,
+                "excerpt": excerpt,
+            })
+
+        if articles:
+            unique_articles = list({article['link']: article for article in articles}.values())
+            sections_data.append({"category": category_name, "articles": unique_articles})
+    
+    return sections_data
+
+def parse_news_page(html: str):
+    """Phân tích một trang /news/N/: trả về (data-max-page hoặc None, danh sách bài viết)."""
+    soup = BeautifulSoup(html, "lxml")
+    max_pages = None
+    anchor = soup.select_one(".e-load-more-anchor[data-max-page]")
+    if anchor: max_pages = int(anchor['data-max-page'])
+
+    articles = []
+    container = soup.select_one(".elementor-1096")
+    if not container:
+        return max_pages, articles
+
+    for post in container.select("article.elementor-post"):
+        a_tag = post.select_one("h3.elementor-post__title a")
+        if not a_tag or not a_tag.get('href'): continue
+        img_tag = post.select_one(".elementor-post__thumbnail img")
+        image_url = get_high_res_image_url(img_tag.get('src') if img_tag else None)
+        excerpt_tag = post.select_one(".elementor-post__excerpt p")
+        articles.append({
+            "title": a_tag.text.strip(),
+            "link": a_tag['href'],
+            "imageUrl": image_url,
+            "excerpt": excerpt_tag.text.strip() if excerpt_tag else "Không có mô tả.",
+        })
+    return max_pages, articles
+
+def parse_clubs(html: str):
+    soup = BeautifulSoup(html, "lxml")
+    page_container = soup.select_one(".elementor-1048")
+    if not page_container:
+        return []
+
+    category_map = {}
+    current_category = None
+
+    for section in page_container.select("section.elementor-top-section"):
+        # Nếu section này là một tiêu đề, đặt nó làm danh mục hiện tại
+        title_tag = section.select_one("h2.elementor-heading-title")
+        if title_tag and title_tag.text.strip():
+            current_category = title_tag.text.strip()
+            if current_category not in category_map:
+                category_map[current_category] = []
+            continue
+
+        # Nếu section này chứa bài viết và đã có danh mục, thêm bài viết vào đó
+        if current_category:
+            posts = section.select("article.ecs-post-loop, article.elementor-post")
+            for post in posts:
+                button = post.select_one("a.elementor-button")
+                if not button or not button.get('href'): continue
+
+                title = button.text.strip()
+                link = button['href']
+                img_tag = post.select_one(".elementor-widget-theme-post-featured-image img")
+                image_url = get_high_res_image_url(img_tag.get('src') if img_tag else None)
+                
+                category_map[current_category].append({
+                    "title": title, 
+                    "link": link, 
+                    "imageUrl": image_url, 
+                    "excerpt": ""
+                })
+
+    # Chuyển đổi map thành list output cuối cùng
+    final_data = []
+    for name, articles in category_map.items():
+        if articles:
+            unique_articles = list({article['link']: article for article in articles}.values())
+            final_data.append({"category": name, "articles": unique_articles})
+    return final_data
+
+def parse_article(html: str):
+    soup = BeautifulSoup(html, "lxml")
+    content_div = soup.select_one(".elementor-widget-theme-post-content .elementor-widget-container")
+    return str(content_div) if content_div else None
@@ -1,169 +1,561 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from lxml import etree
+from lxml import html as lxml_html
 import re
 import sys
 import time
 
+from src import outbound
+from src.config import BASE_URL, CACHE_DIR
+from src.metrics import CACHE_REQUESTS, HTML_PARSE_SECONDS, UPSTREAM_FETCH_SECONDS, track_upstream
+from src.outbound import CircuitOpenError, OUTBOUND_CONNECT_TIMEOUT_SECONDS, OUTBOUND_READ_TIMEOUT_SECONDS
+
 # --- Cấu hình chung ---
-BASE_URL = "https://govolunteerhcmc.vn"
+# Khóa circuit breaker của website nguồn: lấy từ cấu hình, không từ URL người gọi gửi
+# lên, để mỗi biến thể host/cổng lạ không tạo thêm breaker (và chuỗi metric) mới.
+SOURCE_HOST = outbound.host_of(BASE_URL)
 FALLBACK_IMAGE_URL = "https://govolunteerhcmc.vn/wp-content/uploads/2024/02/logo-gv-tron.png"
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36',
     'Referer': 'https://www.google.com/'
 }
+NEWS_CATEGORY_NAME = "Nhật ký tình nguyện"
+# Cào /news song song: tối đa NEWS_MAX_CONCURRENCY kết nối, NEWS_RATE_PER_SECOND request/giây.
+NEWS_MAX_CONCURRENCY = 4
+NEWS_RATE_PER_SECOND = 4.0
+# Chế độ incremental: lưu danh sách bài đã biết, chỉ cào lại toàn bộ sau NEWS_FULL_CRAWL_SECONDS
+# để cập nhật bài bị sửa/xóa.
+NEWS_STATE_FILE = os.path.join(CACHE_DIR, "news_state.json")
+NEWS_FULL_CRAWL_SECONDS = 24 * 3600
+# Số URL tối đa được nhớ ETag/Last-Modified và kết quả phân tích.
+VALIDATOR_CACHE_SIZE = 512
+# Tổng dung lượng (ước lượng) các kết quả phân tích được giữ lại. Kết quả của
+# _parse_article là cả bài HTML: không giới hạn theo byte thì đây thành bản sao thứ
+# hai của ArticleCache, vượt ngoài ARTICLE_MEMORY_BUDGET_BYTES.
+VALIDATOR_CACHE_BUDGET_BYTES = int(os.getenv("VALIDATOR_CACHE_BUDGET_BYTES", str(4 * 1024 * 1024)))
+# Client async dùng chung cho các request cào từ event loop của API.
+SCRAPE_MAX_CONCURRENCY = 16
+# Timeout kết nối và timeout đọc tách riêng (xem src/outbound.py).
+SCRAPE_TIMEOUT = httpx.Timeout(OUTBOUND_READ_TIMEOUT_SECONDS, connect=OUTBOUND_CONNECT_TIMEOUT_SECONDS)
+REQUESTS_TIMEOUT = (OUTBOUND_CONNECT_TIMEOUT_SECONDS, OUTBOUND_READ_TIMEOUT_SECONDS)
+# Lỗi cào mà nơi gọi cần bắt: lỗi mạng/HTTP, hoặc host đang bị ngắt mạch.
+FETCH_ERRORS = (requests.RequestException, CircuitOpenError)
+AFETCH_ERRORS = (httpx.HTTPError, CircuitOpenError)
+
+_IMAGE_SIZE_SUFFIX = re.compile(r'-\d{2,4}x\d{2,4}(?=\.\w+$)')
 
 def get_high_res_image_url(url: str):
     """Loại bỏ các hậu tố kích thước ảnh (-150x150, -300x200, v.v.) để lấy ảnh gốc chất lượng cao."""
     if not url:
         return FALLBACK_IMAGE_URL
-    return re.sub(r'-\d{2,4}x\d{2,4}(?=\.\w+$)', '', url)
+    return _IMAGE_SIZE_SUFFIX.sub('', url)
 
-def _scrape_generic_page(url: str, container_selector: str):
-    """Hàm chung để cào các trang có cấu trúc section > h2 > article."""
+# --- HTTP: SESSION DÙNG CHUNG + CONDITIONAL GET ---
+# Một Session (keep-alive, connection pool) cho mọi request đồng bộ. Với mỗi URL,
+# lưu ETag/Last-Modified, hash nội dung và kết quả đã phân tích: khi server trả
+# 304 hoặc nội dung không đổi, dùng lại kết quả cũ thay vì phân tích lại.
+_session = requests.Session()
+_session.headers.update(HEADERS)
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+_validators: "OrderedDict[str, dict]" = OrderedDict()
+_validators_lock = threading.Lock()
+_validators_bytes = 0
+_MISSING = object()
+
+def _cached_parse(url: str, parse_key: tuple):
+    with _validators_lock:
+        entry = _validators.get(url)
+        if entry is None or parse_key not in entry["parsed"]:
+            return _MISSING
+        _validators.move_to_end(url)
+        return entry["parsed"][parse_key]
+
+def _conditional_headers(url: str, parse_key: tuple) -> dict:
+    """Chỉ gửi validator khi đã có sẵn kết quả phân tích để dùng lại nếu nhận 304."""
+    with _validators_lock:
+        entry = _validators.get(url)
+        if entry is None or parse_key not in entry["parsed"]:
+            return {}
+        headers = {}
+        if entry["etag"]: headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]: headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+def _result_size(result) -> int:
+    if isinstance(result, str):
+        return len(result)
+    return len(json.dumps(result, ensure_ascii=False, default=str))
+
+def _store_parsed(url: str, response_headers, content: bytes, text: str, parse_key: tuple, parse, args: tuple):
+    global _validators_bytes
+    body_hash = hashlib.sha1(content).hexdigest()
+    with _validators_lock:
+        entry = _validators.get(url)
+        parsed = entry["parsed"] if entry and entry["body_hash"] == body_hash else {}
+    if parse_key in parsed:
+        print(f"♻️ Nội dung không đổi, dùng lại kết quả: {url}")
+        CACHE_REQUESTS.inc(cache="http_validator", result="unchanged")
+        result = parsed[parse_key]
+    else:
+        with HTML_PARSE_SECONDS.time(parser=parse.__name__):
+            result = parse(text, *args)
+        parsed = {**parsed, parse_key: result}
+    size = sum(_result_size(value) for value in parsed.values())
+    if size > VALIDATOR_CACHE_BUDGET_BYTES:
+        parsed, size = {}, 0
+    with _validators_lock:
+        previous = _validators.pop(url, None)
+        if previous is not None:
+            _validators_bytes -= previous["size"]
+        _validators[url] = {
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "body_hash": body_hash,
+            "parsed": parsed,
+            "size": size,
+        }
+        _validators_bytes += size
+        while len(_validators) > VALIDATOR_CACHE_SIZE or _validators_bytes > VALIDATOR_CACHE_BUDGET_BYTES:
+            _validators_bytes -= _validators.popitem(last=False)[1]["size"]
+    return result
+
+def _is_status_failure(status: int) -> bool:
+    return status >= 500 or status == 429
+
+def _is_requests_failure(e: BaseException) -> bool:
+    """Lỗi do website nguồn (timeout, kết nối, 5xx, 429): được thử lại và tính vào breaker."""
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return _is_status_failure(e.response.status_code)
+    return isinstance(e, requests.RequestException)
+
+def _is_httpx_failure(e: BaseException) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        return _is_status_failure(e.response.status_code)
+    return isinstance(e, httpx.HTTPError)
+
+def _fallback(url: str, parse_key: tuple, error: Exception, is_failure):
+    """Upstream lỗi hoặc bị ngắt mạch: dùng kết quả phân tích tốt gần nhất của URL nếu còn."""
+    cached = _cached_parse(url, parse_key)
+    if cached is _MISSING or not (isinstance(error, CircuitOpenError) or is_failure(error)):
+        raise error
+    print(f"⚠️ Không tải được {url} ({error}), dùng kết quả tốt gần nhất.", file=sys.stderr)
+    CACHE_REQUESTS.inc(cache="http_validator", result="fallback")
+    return cached
+
+def _get(url: str, parse_key: tuple):
+    """Một lần GET có điều kiện. Trả về (response, kết quả cũ nếu nhận 304 hoặc _MISSING)."""
+    with track_upstream(UPSTREAM_FETCH_SECONDS, "website", (requests.Timeout,), client="requests"):
+        response = _session.get(url, headers=_conditional_headers(url, parse_key), timeout=REQUESTS_TIMEOUT)
+        if response.status_code == 304:
+            cached = _cached_parse(url, parse_key)
+            if cached is not _MISSING:
+                return response, cached
+            # Kết quả cũ vừa bị loại khỏi bộ nhớ: tải lại đầy đủ.
+            response = _session.get(url, timeout=REQUESTS_TIMEOUT)
+        response.raise_for_status()
+    return response, _MISSING
+
+def _fetch_parsed(url: str, parse, *args):
+    """GET có điều kiện rồi phân tích bằng parse(html, *args); lỗi ném một trong FETCH_ERRORS."""
+    parse_key = (parse.__name__,) + args
     try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
+        response, cached = outbound.call(SOURCE_HOST, _get, url, parse_key,
+                                         is_failure=_is_requests_failure)
+    except FETCH_ERRORS as e:
+        return _fallback(url, parse_key, e, _is_requests_failure)
+    if cached is not _MISSING:
+        print(f"♻️ 304 Not Modified, dùng lại kết quả: {url}")
+        CACHE_REQUESTS.inc(cache="http_validator", result="not_modified")
+        return cached
+    return _store_parsed(url, response.headers, response.content, response.text, parse_key, parse, args)
+
+_async_client = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """Client httpx dùng chung (gắn với event loop đầu tiên dùng nó); số kết nối
+    tối đa SCRAPE_MAX_CONCURRENCY, request vượt quá sẽ xếp hàng trong pool."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        limits = httpx.Limits(max_connections=SCRAPE_MAX_CONCURRENCY,
+                              max_keepalive_connections=SCRAPE_MAX_CONCURRENCY)
+        _async_client = httpx.AsyncClient(headers=HEADERS, timeout=SCRAPE_TIMEOUT,
+                                          limits=limits, follow_redirects=True)
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+async def _aget(client: httpx.AsyncClient, url: str, parse_key: tuple):
+    with track_upstream(UPSTREAM_FETCH_SECONDS, "website", (httpx.TimeoutException,), client="httpx"):
+        response = await client.get(url, headers=_conditional_headers(url, parse_key))
+        if response.status_code == 304:
+            cached = _cached_parse(url, parse_key)
+            if cached is not _MISSING:
+                return response, cached
+            response = await client.get(url)
         response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"❌ Lỗi khi cào {url}: {e}", file=sys.stderr)
-        return []
+    return response, _MISSING
 
-    soup = BeautifulSoup(response.text, "lxml")
-    sections_data = []
-    page_container = soup.select_one(container_selector)
-    if not page_container:
-        print(f"❌ Không tìm thấy container '{container_selector}' tại {url}", file=sys.stderr)
-        return []
+async def _afetch_parsed(client: httpx.AsyncClient, url: str, parse, *args):
+    """Bản async của _fetch_parsed (dùng chung bộ nhớ validator); phân tích ngoài event loop."""
+    parse_key = (parse.__name__,) + args
+    try:
+        response, cached = await outbound.acall(SOURCE_HOST, _aget, client, url, parse_key,
+                                                is_failure=_is_httpx_failure)
+    except AFETCH_ERRORS as e:
+        return _fallback(url, parse_key, e, _is_httpx_failure)
+    if cached is not _MISSING:
+        print(f"♻️ 304 Not Modified, dùng lại kết quả: {url}")
+        CACHE_REQUESTS.inc(cache="http_validator", result="not_modified")
+        return cached
+    return await asyncio.to_thread(
+        _store_parsed, url, response.headers, response.content, response.text, parse_key, parse, args)
+
+# --- PHÂN TÍCH HTML ---
+# Các trang Elementor được phân tích bằng lxml với biểu thức XPath biên dịch sẵn,
+# chỉ duyệt trong container của trang. Kết quả giống hệt bản BeautifulSoup cũ
+# (xem benchmarks/soup_parsers.py và benchmarks/bench_parsers.py).
 
-    for sec in page_container.select("section.elementor-top-section"):
-        h2 = sec.select_one("h2.elementor-heading-title")
-        if not h2 or not h2.text.strip():
+def _cls(name: str) -> str:
+    """Điều kiện XPath tương đương bộ chọn CSS `.name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_X_CONTAINER = etree.XPath(
+    "(//*[contains(concat(' ', normalize-space(@class), ' '), concat(' ', $name, ' '))])[1]")
+_X_MAX_PAGE = etree.XPath(f"(//*[{_cls('e-load-more-anchor')}][@data-max-page])[1]")
+_X_SECTIONS = etree.XPath(f".//section[{_cls('elementor-top-section')}]")
+_X_HEADING = etree.XPath(f"(.//h2[{_cls('elementor-heading-title')}])[1]")
+_X_POSTS = etree.XPath(f".//article[{_cls('elementor-post')}]")
+_X_CLUB_POSTS = etree.XPath(f".//article[{_cls('ecs-post-loop')} or {_cls('elementor-post')}]")
+_X_POST_LINK = etree.XPath(f"(.//h3[{_cls('elementor-post__title')}]//a)[1]")
+_X_POST_IMAGE = etree.XPath(f"(.//*[{_cls('elementor-post__thumbnail')}]//img)[1]")
+_X_POST_EXCERPT = etree.XPath(f"(.//*[{_cls('elementor-post__excerpt')}]//p)[1]")
+_X_CLUB_BUTTON = etree.XPath(f"(.//a[{_cls('elementor-button')}])[1]")
+_X_CLUB_IMAGE = etree.XPath(f"(.//*[{_cls('elementor-widget-theme-post-featured-image')}]//img)[1]")
+_X_ARTICLE_CONTENT = etree.XPath(
+    f"(//*[{_cls('elementor-widget-theme-post-content')}]//*[{_cls('elementor-widget-container')}])[1]")
+
+def _parse_document(html: str):
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+def _first(xpath, node, **variables):
+    found = xpath(node, **variables)
+    return found[0] if found else None
+
+def _text(node) -> str:
+    return "".join(node.itertext()).strip()
+
+def _container(doc, container_selector: str):
+    return _first(_X_CONTAINER, doc, name=container_selector.lstrip("."))
+
+def _parse_post(post, image_fallback_to_data_src: bool):
+    a_tag = _first(_X_POST_LINK, post)
+    if a_tag is None or not a_tag.get('href'):
+        return None
+    img_tag = _first(_X_POST_IMAGE, post)
+    if image_fallback_to_data_src:
+        image_url = FALLBACK_IMAGE_URL
+        if img_tag is not None:
+            src = img_tag.get('src') or img_tag.get('data-src')
+            if src:
+                image_url = get_high_res_image_url(src)
+    else:
+        image_url = get_high_res_image_url(img_tag.get('src') if img_tag is not None else None)
+    excerpt_tag = _first(_X_POST_EXCERPT, post)
+    return {
+        "title": _text(a_tag),
+        "link": a_tag.get('href'),
+        "imageUrl": image_url,
+        "excerpt": _text(excerpt_tag) if excerpt_tag is not None else "Không có mô tả.",
+    }
+
+def _parse_generic_page(html: str, container_selector: str):
+    """Phân tích trang có cấu trúc section > h2 > article; None nếu không thấy container."""
+    doc = _parse_document(html)
+    page_container = _container(doc, container_selector) if doc is not None else None
+    if page_container is None:
+        return None
+
+    sections_data = []
+    for sec in _X_SECTIONS(page_container):
+        h2 = _first(_X_HEADING, sec)
+        category_name = _text(h2) if h2 is not None else ""
+        if not category_name:
             continue
-        category_name = h2.text.strip()
-        
+
         articles = []
-        for post in sec.select("article.elementor-post"):
-            a_tag = post.select_one("h3.elementor-post__title a")
-            if not a_tag or not a_tag.get('href'):
-                continue
-
-            img_tag = post.select_one(".elementor-post__thumbnail img")
-            image_url = FALLBACK_IMAGE_URL
-            if img_tag:
-                src = img_tag.get('src') or img_tag.get('data-src')
-                if src:
-                    image_url = get_high_res_image_url(src)
-
-            excerpt_tag = post.select_one(".elementor-post__excerpt p")
-            excerpt = excerpt_tag.text.strip() if excerpt_tag else "Không có mô tả."
-            
-            articles.append({
-                "title": a_tag.text.strip(),
-                "link": a_tag['href'],
-                "imageUrl": image_url,
-                "excerpt": excerpt,
-            })
+        for post in _X_POSTS(sec):
+            article = _parse_post(post, image_fallback_to_data_src=True)
+            if article:
+                articles.append(article)
 
         if articles:
             unique_articles = list({article['link']: article for article in articles}.values())
             sections_data.append({"category": category_name, "articles": unique_articles})
-    
+
     return sections_data
 
+def _scrape_generic_page(url: str, container_selector: str):
+    """Hàm chung để cào các trang có cấu trúc section > h2 > article."""
+    try:
+        data = _fetch_parsed(url, _parse_generic_page, container_selector)
+    except FETCH_ERRORS as e:
+        print(f"❌ Lỗi khi cào {url}: {e}", file=sys.stderr)
+        return []
+
+    if data is None:
+        print(f"❌ Không tìm thấy container '{container_selector}' tại {url}", file=sys.stderr)
+        return []
+    return data
+
 # --- TRIỂN KHAI CÁC HÀM SCRAPE ---
 
-def scrape_news():
-    """Cào toàn bộ bài viết từ trang /news và các trang con."""
+def _parse_news_page(html: str):
+    """Phân tích một trang /news/N/: trả về (data-max-page hoặc None, danh sách bài viết)."""
+    doc = _parse_document(html)
+    if doc is None:
+        return None, []
+    max_pages = None
+    anchor = _first(_X_MAX_PAGE, doc)
+    if anchor is not None: max_pages = int(anchor.get('data-max-page'))
+
+    articles = []
+    container = _container(doc, ".elementor-1096")
+    if container is None:
+        return max_pages, articles
+
+    for post in _X_POSTS(container):
+        article = _parse_post(post, image_fallback_to_data_src=False)
+        if article:
+            articles.append(article)
+    return max_pages, articles
+
+def _news_page_url(page: int) -> str:
+    base_news_url = f"{BASE_URL}/news/"
+    return f"{base_news_url}{page}/" if page > 1 else base_news_url
+
+def _news_result(all_articles):
+    unique_articles = list({article['link']: article for article in all_articles}.values())
+    print(f"✅ Cào xong! Tìm thấy {len(unique_articles)} bài viết độc nhất.")
+    return [{"category": NEWS_CATEGORY_NAME, "articles": unique_articles}] if unique_articles else []
+
+def _load_news_state():
+    try:
+        with open(NEWS_STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_news_state(articles, last_full_crawl: float):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{NEWS_STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"articles": articles, "last_full_crawl": last_full_crawl}, f, ensure_ascii=False)
+    os.replace(tmp_path, NEWS_STATE_FILE)
+
+def _scrape_news_incremental(state):
+    """Cào từ trang mới nhất, dừng ở trang đầu tiên mà mọi bài đều đã biết."""
+    print("🚀 Bắt đầu cào incremental dữ liệu từ /news/...")
+    known_articles = state["articles"]
+    known_links = {article['link'] for article in known_articles}
+    new_articles = []
+    page = 1
+    max_pages = 1
+
+    while page <= max_pages:
+        current_url = _news_page_url(page)
+        print(f"📄 Đang cào trang: {current_url}")
+        try:
+            page_max, articles = _fetch_parsed(current_url, _parse_news_page)
+        except FETCH_ERRORS as e:
+            # Không lưu kết quả dở dang, nếu không các bài ở trang lỗi sẽ bị bỏ sót.
+            print(f"❌ Lỗi khi cào trang {current_url}: {e}", file=sys.stderr)
+            return []
+
+        if page == 1 and page_max:
+            max_pages = page_max
+
+        fresh = [article for article in articles if article['link'] not in known_links]
+        if not fresh:
+            break
+        new_articles.extend(fresh)
+        page += 1
+        if page <= max_pages: time.sleep(1)
+
+    print(f"🔍 Có {len(new_articles)} bài viết mới.")
+    new_links = {article['link'] for article in new_articles}
+    all_articles = new_articles + [article for article in known_articles if article['link'] not in new_links]
+    _save_news_state(all_articles, state["last_full_crawl"])
+    return _news_result(all_articles)
+
+def _crawl_news(full_crawl, incremental: bool):
+    """full_crawl() trả về (danh sách bài, complete); complete=False nếu có trang lỗi."""
+    if incremental:
+        state = _load_news_state()
+        if state and time.time() - state.get("last_full_crawl", 0) < NEWS_FULL_CRAWL_SECONDS:
+            return _scrape_news_incremental(state)
+
+    started_at = time.time()
+    all_articles, complete = full_crawl()
+    data = _news_result(all_articles)
+    if incremental and data:
+        if complete:
+            _save_news_state(data[0]["articles"], started_at)
+        else:
+            # Lần cào thiếu trang không được dùng làm mốc: các lần incremental sau dừng ở
+            # trang 1 nên sẽ không bao giờ lấy lại các bài bị thiếu. Lần sau cào lại toàn bộ.
+            print("⚠️ Cào /news thiếu trang, không lưu trạng thái incremental.", file=sys.stderr)
+    return data
+
+def scrape_news(incremental: bool = False):
+    """Cào bài viết từ trang /news và các trang con.
+
+    Với incremental=True, chỉ cào các trang có bài mới (thường chỉ trang 1) và
+    gộp vào danh sách đã lưu; vẫn cào lại toàn bộ sau NEWS_FULL_CRAWL_SECONDS.
+    """
+    return _crawl_news(_crawl_news_pages, incremental)
+
+def _scrape_news_full():
+    return _news_result(_crawl_news_pages()[0])
+
+def _crawl_news_pages():
+    """Cào tuần tự mọi trang /news; trả về (bài viết, complete), dừng ở trang lỗi đầu tiên."""
     print("🚀 Bắt đầu cào dữ liệu từ /news/...")
     all_articles = []
     page = 1
     max_pages = 1
-    category_name = "Nhật ký tình nguyện"
-    base_news_url = f"{BASE_URL}/news/"
 
     while page <= max_pages:
-        current_url = f"{base_news_url}{page}/" if page > 1 else base_news_url
+        current_url = _news_page_url(page)
         print(f"📄 Đang cào trang: {current_url}")
         try:
-            response = requests.get(current_url, headers=HEADERS, timeout=20)
-            response.raise_for_status()
-        except requests.RequestException as e:
+            page_max, articles = _fetch_parsed(current_url, _parse_news_page)
+        except FETCH_ERRORS as e:
             print(f"❌ Lỗi khi cào trang {current_url}: {e}", file=sys.stderr)
-            break
+            return all_articles, False
 
-        soup = BeautifulSoup(response.text, "lxml")
         if page == 1:
-            anchor = soup.select_one(".e-load-more-anchor[data-max-page]")
-            if anchor: max_pages = int(anchor['data-max-page'])
+            if page_max: max_pages = page_max
             print(f"🔍 Tìm thấy tổng cộng {max_pages} trang.")
 
-        container = soup.select_one(".elementor-1096")
-        if not container:
-            page += 1
-            continue
-            
-        for post in container.select("article.elementor-post"):
-            a_tag = post.select_one("h3.elementor-post__title a")
-            if not a_tag or not a_tag.get('href'): continue
-            img_tag = post.select_one(".elementor-post__thumbnail img")
-            image_url = get_high_res_image_url(img_tag.get('src') if img_tag else None)
-            excerpt_tag = post.select_one(".elementor-post__excerpt p")
-            all_articles.append({
-                "title": a_tag.text.strip(),
-                "link": a_tag['href'],
-                "imageUrl": image_url,
-                "excerpt": excerpt_tag.text.strip() if excerpt_tag else "Không có mô tả.",
-            })
+        all_articles.extend(articles)
         page += 1
         if page <= max_pages: time.sleep(1)
 
-    unique_articles = list({article['link']: article for article in all_articles}.values())
-    print(f"✅ Cào xong! Tìm thấy {len(unique_articles)} bài viết độc nhất.")
-    return [{"category": category_name, "articles": unique_articles}] if unique_articles else []
+    return all_articles, True
 
-def scrape_clubs():
-    """Cào dữ liệu các CLB, Đội, Nhóm từ trang /clubs một cách ổn định."""
-    url = f"{BASE_URL}/clubs/"
-    print(f"🚀 Bắt đầu cào dữ liệu từ {url}...")
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=20)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"❌ Lỗi khi cào {url}: {e}", file=sys.stderr)
-        return []
+class TokenBucket:
+    """Giới hạn tốc độ gửi request (token bucket) cho asyncio."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def scrape_news_async(max_concurrency: int = NEWS_MAX_CONCURRENCY,
+                            rate_per_second: float = NEWS_RATE_PER_SECOND):
+    """Như scrape_news nhưng cào các trang con song song (giới hạn số kết nối và tốc độ)."""
+    return _news_result((await _crawl_news_pages_async(max_concurrency, rate_per_second))[0])
+
+async def _crawl_news_pages_async(max_concurrency: int = NEWS_MAX_CONCURRENCY,
+                                  rate_per_second: float = NEWS_RATE_PER_SECOND):
+    """Bản song song của _crawl_news_pages; complete=False nếu có trang lỗi (bị bỏ qua)."""
+    print("🚀 Bắt đầu cào song song dữ liệu từ /news/...")
+    bucket = TokenBucket(rate_per_second)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
 
-    soup = BeautifulSoup(response.text, "lxml")
-    page_container = soup.select_one(".elementor-1048")
-    if not page_container:
+    async with httpx.AsyncClient(headers=HEADERS, timeout=SCRAPE_TIMEOUT, limits=limits, follow_redirects=True) as client:
+        async def fetch_and_parse(url: str):
+            async with semaphore:
+                await bucket.acquire()
+                try:
+                    return await _afetch_parsed(client, url, _parse_news_page)
+                except AFETCH_ERRORS as e:
+                    print(f"❌ Lỗi khi cào trang {url}: {e}", file=sys.stderr)
+                    return None
+
+        first = await fetch_and_parse(_news_page_url(1))
+        if first is None:
+            return [], False
+        max_pages = first[0] or 1
+        print(f"🔍 Tìm thấy tổng cộng {max_pages} trang.")
+
+        pages = await asyncio.gather(*(fetch_and_parse(_news_page_url(p)) for p in range(2, max_pages + 1)))
+
+    all_articles = list(first[1])
+    for page in pages:
+        if page is not None:
+            all_articles.extend(page[1])
+    return all_articles, None not in pages
+
+def scrape_news_concurrent(incremental: bool = False):
+    """Như scrape_news, nhưng lần cào toàn bộ dùng scrape_news_async. Dùng được từ threadpool."""
+    return _crawl_news(lambda: asyncio.run(_crawl_news_pages_async()), incremental)
+
+def _parse_clubs(html: str):
+    doc = _parse_document(html)
+    page_container = _container(doc, ".elementor-1048") if doc is not None else None
+    if page_container is None:
         return []
 
     category_map = {}
     current_category = None
 
-    for section in page_container.select("section.elementor-top-section"):
+    for section in _X_SECTIONS(page_container):
         # Nếu section này là một tiêu đề, đặt nó làm danh mục hiện tại
-        title_tag = section.select_one("h2.elementor-heading-title")
-        if title_tag and title_tag.text.strip():
-            current_category = title_tag.text.strip()
+        title_tag = _first(_X_HEADING, section)
+        title = _text(title_tag) if title_tag is not None else ""
+        if title:
+            current_category = title
             if current_category not in category_map:
                 category_map[current_category] = []
             continue
 
         # Nếu section này chứa bài viết và đã có danh mục, thêm bài viết vào đó
         if current_category:
-            posts = section.select("article.ecs-post-loop, article.elementor-post")
-            for post in posts:
-                button = post.select_one("a.elementor-button")
-                if not button or not button.get('href'): continue
-
-                title = button.text.strip()
-                link = button['href']
-                img_tag = post.select_one(".elementor-widget-theme-post-featured-image img")
-                image_url = get_high_res_image_url(img_tag.get('src') if img_tag else None)
-                
+            for post in _X_CLUB_POSTS(section):
+                button = _first(_X_CLUB_BUTTON, post)
+                if button is None or not button.get('href'): continue
+
+                img_tag = _first(_X_CLUB_IMAGE, post)
+                image_url = get_high_res_image_url(img_tag.get('src') if img_tag is not None else None)
+
                 category_map[current_category].append({
-                    "title": title, 
-                    "link": link, 
-                    "imageUrl": image_url, 
+                    "title": _text(button),
+                    "link": button.get('href'),
+                    "imageUrl": image_url,
                     "excerpt": ""
                 })
 
@@ -173,6 +565,17 @@ def scrape_clubs():
         if articles:
             unique_articles = list({article['link']: article for article in articles}.values())
             final_data.append({"category": name, "articles": unique_articles})
+    return final_data
+
+def scrape_clubs():
+    """Cào dữ liệu các CLB, Đội, Nhóm từ trang /clubs một cách ổn định."""
+    url = f"{BASE_URL}/clubs/"
+    print(f"🚀 Bắt đầu cào dữ liệu từ {url}...")
+    try:
+        final_data = _fetch_parsed(url, _parse_clubs)
+    except FETCH_ERRORS as e:
+        print(f"❌ Lỗi khi cào {url}: {e}", file=sys.stderr)
+        return []
 
     print(f"✅ Cào xong /clubs! Tìm thấy {len(final_data)} danh mục.")
     return final_data
@@ -202,19 +605,43 @@ def scrape_ideas():
     print(f"✅ Cào xong {url}! Tìm thấy {len(data)} danh mục.")
     return data
 
+def _parse_article(html: str):
+    doc = _parse_document(html)
+    content_div = _first(_X_ARTICLE_CONTENT, doc) if doc is not None else None
+    if content_div is None:
+        return None
+    # Tìm bằng lxml, nhưng chỉ đưa phần nội dung qua BeautifulSoup để HTML trả về
+    # được tuần tự hóa giống hệt trước đây.
+    from bs4 import BeautifulSoup  # chỉ cần cho bài viết: import lúc dùng lần đầu
+
+    fragment = lxml_html.tostring(content_div, encoding="unicode", with_tail=False)
+    soup = BeautifulSoup(fragment, "lxml")
+    return str(soup.body.find(True, recursive=False))
+
 def scrape_article_with_requests(article_url: str):
     """Lấy nội dung chi tiết của một bài viết."""
     print(f"🚀 Sử dụng `requests` để lấy dữ liệu bài viết: {article_url}")
     try:
-        response = requests.get(article_url, headers=HEADERS, timeout=20)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "lxml")
-        content_div = soup.select_one(".elementor-widget-theme-post-content .elementor-widget-container")
-        if not content_div:
+        content = _fetch_parsed(article_url, _parse_article)
+        if content is None:
             print("❌ Không tìm thấy thẻ div chứa nội dung.", file=sys.stderr)
             return None
         print("✅ Lấy nội dung bài viết thành công!")
-        return str(content_div)
-    except requests.RequestException as e:
+        return content
+    except FETCH_ERRORS as e:
         print(f"❌ Lỗi khi dùng requests cho bài viết: {e}", file=sys.stderr)
-        return None
\ No newline at end of file
+        return None
+
+async def scrape_article_async(article_url: str):
+    """Bản async của scrape_article_with_requests, dùng client httpx dùng chung."""
+    print(f"🚀 Sử dụng `httpx` để lấy dữ liệu bài viết: {article_url}")
+    try:
+        content = await _afetch_parsed(get_async_client(), article_url, _parse_article)
+    except AFETCH_ERRORS as e:
+        print(f"❌ Lỗi khi dùng httpx cho bài viết: {e}", file=sys.stderr)
+        return None
+    if content is None:
+        print("❌ Không tìm thấy thẻ div chứa nội dung.", file=sys.stderr)
+        return None
+    print("✅ Lấy nội dung bài viết thành công!")
+    return content
@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from src.metrics import CACHE_REQUESTS
+from src.sqlite_db import CACHE_DB_PATH, SQLiteDatabase
+
+ARTICLE_CACHE_TTL_SECONDS = int(os.getenv("ARTICLE_CACHE_TTL_SECONDS", str(6 * 3600)))
+ARTICLE_MEMORY_BUDGET_BYTES = int(os.getenv("ARTICLE_MEMORY_BUDGET_BYTES", str(32 * 1024 * 1024)))
+# Tổng dung lượng (đã nén) của tầng đĩa; vượt quá thì xóa các bài lưu lâu nhất.
+ARTICLE_DISK_BUDGET_BYTES = int(os.getenv("ARTICLE_DISK_BUDGET_BYTES", str(256 * 1024 * 1024)))
+# Bài đã quá TTL vẫn được giữ trên đĩa tới ARTICLE_STALE_SECONDS (prune chỉ xóa bài cũ
+# hơn mức này), để /article còn bản dự phòng khi website nguồn lỗi.
+ARTICLE_STALE_SECONDS = int(os.getenv("ARTICLE_STALE_SECONDS", str(7 * 24 * 3600)))
+
+
+def article_key(url: str) -> str:
+    """Khóa cache của một bài: bỏ query và fragment, để ?x=1, ?x=2... không thành các bản sao riêng."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+class MemoryLRU:
+    """LRU trong bộ nhớ, giới hạn theo tổng số byte của nội dung HTML."""
+
+    def __init__(self, budget_bytes: int, ttl_seconds: int):
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size_bytes = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, stored_at, size = item
+            if time.time() - stored_at >= self.ttl_seconds:
+                del self._items[key]
+                self.size_bytes -= size
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str, stored_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[2]
+            self._items[key] = (value, stored_at, size)
+            self.size_bytes += size
+            while self.size_bytes > self.budget_bytes:
+                _, (_, _, evicted_size) = self._items.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskStore:
+    """Tầng đĩa dùng SQLite (WAL), nén zlib; dùng chung giữa các worker gunicorn
+    và còn lại sau khi khởi động lại."""
+
+    def __init__(self, path: str, ttl_seconds: int, stale_seconds: int = ARTICLE_STALE_SECONDS,
+                 budget_bytes: int = ARTICLE_DISK_BUDGET_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = max(stale_seconds, ttl_seconds)
+        self.budget_bytes = budget_bytes
+        self.db = SQLiteDatabase(path, schema=(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "url TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS articles_stored_at ON articles (stored_at)",
+        ))
+
+    def get(self, key: str, allow_expired: bool = False) -> Optional[tuple]:
+        row = self.db.connect().execute(
+            "SELECT body, stored_at FROM articles WHERE url = ?", (key,)).fetchone()
+        max_age = self.stale_seconds if allow_expired else self.ttl_seconds
+        if row is None or time.time() - row[1] >= max_age:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8"), row[1]
+
+    def put(self, key: str, value: str, stored_at: float):
+        body = zlib.compress(value.encode("utf-8"))
+        if len(body) > self.budget_bytes:
+            return
+        with self.db.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO articles (url, body, size, stored_at) VALUES (?, ?, ?, ?)",
+                (key, body, len(body), stored_at),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        # Giống MemoryLRU: vượt ngân sách thì bỏ các bài lưu lâu nhất trước.
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0] - self.budget_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for url, size in conn.execute("SELECT url, size FROM articles ORDER BY stored_at"):
+            evicted.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM articles WHERE url = ?", evicted)
+
+    def prune(self) -> int:
+        with self.db.connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM articles WHERE stored_at < ?", (time.time() - self.stale_seconds,))
+            return cursor.rowcount
+
+
+class ArticleCache:
+    """Cache HTML bài viết hai tầng: LRU trong bộ nhớ, rồi SQLite trên đĩa."""
+
+    def __init__(self, db_path: str = CACHE_DB_PATH,
+                 budget_bytes: int = ARTICLE_MEMORY_BUDGET_BYTES,
+                 ttl_seconds: int = ARTICLE_CACHE_TTL_SECONDS):
+        self.memory = MemoryLRU(budget_bytes, ttl_seconds)
+        self.disk: Optional[DiskStore] = None
+        try:
+            self.disk = DiskStore(db_path, ttl_seconds)
+        except sqlite3.Error as e:
+            print(f"⚠️ Không mở được cache bài viết trên đĩa ({db_path}), chỉ dùng bộ nhớ: {e}")
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._counters_lock:
+            self._counters[name] += 1
+        CACHE_REQUESTS.inc(cache="article", result=name)
+
+    def _get_from_disk(self, url: str) -> Optional[str]:
+        if self.disk is None:
+            return None
+        try:
+            item = self.disk.get(url)
+        except sqlite3.Error as e:
+            print(f"⚠️ Lỗi đọc cache bài viết trên đĩa: {e}")
+            return None
+        if item is None:
+            return None
+        html, stored_at = item
+        self.memory.put(url, html, stored_at)
+        return html
+
+    def get(self, url: str, memory_only: bool = False) -> Optional[str]:
+        """Tra bộ nhớ rồi tới đĩa. memory_only=True không chạm đĩa (an toàn trong event loop)."""
+        url = article_key(url)
+        html = self.memory.get(url)
+        if html is not None:
+            self._count("memory_hits")
+            return html
+        if memory_only:
+            return None
+        html = self._get_from_disk(url)
+        self._count("disk_hits" if html is not None else "misses")
+        return html
+
+    def get_stale(self, url: str) -> Optional[str]:
+        """Bản trên đĩa kể cả đã quá TTL (tối đa ARTICLE_STALE_SECONDS): dùng khi không cào lại được."""
+        url = article_key(url)
+        if self.disk is None:
+            return None
+        try:
+            item = self.disk.get(url, allow_expired=True)
+        except sqlite3.Error as e:
+            print(f"⚠️ Lỗi đọc cache bài viết trên đĩa: {e}")
+            return None
+        if item is not None:
+            self._count("stale_hits")
+        return item[0] if item else None
+
+    def put(self, url: str, html: str):
+        url = article_key(url)
+        stored_at = time.time()
+        self.memory.put(url, html, stored_at)
+        if self.disk is not None:
+            try:
+                self.disk.put(url, html, stored_at)
+            except sqlite3.Error as e:
+                print(f"⚠️ Lỗi ghi cache bài viết xuống đĩa: {e}")
+
+    def warm(self, urls: Iterable[str], fetch: Optional[Callable[[str], Optional[str]]] = None) -> int:
+        """Nạp sẵn các URL vào bộ nhớ: lấy từ đĩa nếu có, nếu không thì gọi fetch (nếu có)."""
+        if self.disk is not None:
+            try:
+                self.disk.prune()
+            except sqlite3.Error:
+                pass
+        warmed = 0
+        for url in map(article_key, urls):
+            if self.memory.get(url) is not None or self._get_from_disk(url) is not None:
+                warmed += 1
+                continue
+            if fetch is not None:
+                html = fetch(url)
+                if html is not None:
+                    self.put(url, html)
+                    warmed += 1
+        return warmed
+
+    def stats(self) -> Dict[str, int]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        counters["memory_items"] = len(self.memory)
+        counters["memory_bytes"] = self.memory.size_bytes
+        return counters
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from src.metrics import THREADPOOL_WAIT_SECONDS, UPSTREAM_ERRORS, Gauge
+
+# Các lời gọi chặn (googleapiclient, requests, SQLite) chạy trên pool riêng thay vì
+# threadpool mặc định của FastAPI, để một upstream chậm không chặn các route khác.
+# Mỗi pool giới hạn số lời gọi đồng thời tới upstream của nó; mỗi lời gọi có timeout
+# (tính cả thời gian xếp hàng).
+SHEETS_MAX_WORKERS = int(os.getenv("SHEETS_MAX_WORKERS", "16"))
+SLOW_UPSTREAM_MAX_WORKERS = int(os.getenv("SLOW_UPSTREAM_MAX_WORKERS", "8"))
+SHEETS_TIMEOUT_SECONDS = 30
+SLOW_UPSTREAM_TIMEOUT_SECONDS = 60
+
+sheets_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+slow_upstream_executor = ThreadPoolExecutor(max_workers=SLOW_UPSTREAM_MAX_WORKERS, thread_name_prefix="slow-upstream")
+
+# Mức độ bão hòa của từng pool: số việc đang chạy và đang xếp hàng.
+_pool_usage: Dict[str, Dict[str, int]] = {
+    "sheets": {"running": 0, "queued": 0, "max_workers": SHEETS_MAX_WORKERS},
+    "slow-upstream": {"running": 0, "queued": 0, "max_workers": SLOW_UPSTREAM_MAX_WORKERS},
+}
+_pool_usage_lock = threading.Lock()
+
+
+def _pool_usage_samples(field: str) -> Dict[Tuple[str, ...], float]:
+    with _pool_usage_lock:
+        return {(pool,): usage[field] for pool, usage in _pool_usage.items()}
+
+
+for _field, _documentation in (("running", "Số việc đang chạy trong pool luồng."),
+                               ("queued", "Số việc đang chờ một luồng rảnh."),
+                               ("max_workers", "Số luồng tối đa của pool.")):
+    Gauge(f"govolunteer_threadpool_{_field}", _documentation, ("pool",),
+          callback=lambda field=_field: _pool_usage_samples(field))
+
+
+def _adjust(pool: str, field: str, delta: int):
+    with _pool_usage_lock:
+        _pool_usage[pool][field] += delta
+
+
+async def _run_in(executor: ThreadPoolExecutor, timeout: float, fn: Callable, *args) -> Any:
+    pool = executor._thread_name_prefix
+    submitted_at = time.perf_counter()
+
+    def run():
+        THREADPOOL_WAIT_SECONDS.observe(time.perf_counter() - submitted_at, pool=pool)
+        _adjust(pool, "queued", -1)
+        _adjust(pool, "running", 1)
+        try:
+            return fn(*args)
+        finally:
+            _adjust(pool, "running", -1)
+
+    _adjust(pool, "queued", 1)
+    future = executor.submit(run)
+    # Việc bị hủy khi còn trong hàng đợi (do timeout) sẽ không bao giờ chạy run().
+    future.add_done_callback(lambda f: f.cancelled() and _adjust(pool, "queued", -1))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        UPSTREAM_ERRORS.inc(upstream=f"{pool}-pool", kind="timeout")
+        raise
+
+
+async def run_sheets(fn: Callable, *args, timeout: float = SHEETS_TIMEOUT_SECONDS) -> Any:
+    """Chạy một lời gọi Google Sheets trên pool riêng; quá hạn ném asyncio.TimeoutError."""
+    return await _run_in(sheets_executor, timeout, fn, *args)
+
+
+async def run_slow_upstream(fn: Callable, *args, timeout: float = SLOW_UPSTREAM_TIMEOUT_SECONDS) -> Any:
+    """Chạy một lời gọi chặn tới upstream chậm (cào website, cache trên đĩa) trên pool riêng."""
+    return await _run_in(slow_upstream_executor, timeout, fn, *args)
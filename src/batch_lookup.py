@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+from typing import Dict, List
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from googleapiclient.errors import HttpError
+from pydantic import BaseModel
+
+from src.async_io import run_sheets
+from src.sheets_utils import ACTIVITY_SHEET_ID, CERTIFICATE_SHEET_ID, find_many_in_sheet, normalize_cccd
+
+# Tra cứu hàng loạt cho các tổ chức đối tác: mỗi spreadsheet chỉ đọc (tối đa) một
+# lần qua SheetIndex, rồi mọi CCCD được tra trong bộ nhớ.
+BATCH_LOOKUP_MAX_IDS = int(os.getenv("BATCH_LOOKUP_MAX_IDS", "5000"))
+BATCH_LOOKUP_FORMATS = ("json", "ndjson")
+BATCH_LOOKUP_STREAM_CHUNK = 500
+
+router = APIRouter()
+
+
+class BatchLookupRequest(BaseModel):
+    citizenIds: List[str]
+
+
+def _unique_ids(citizen_ids: List[str]) -> List[str]:
+    """Chuẩn hóa, bỏ chuỗi rỗng và CCCD trùng, giữ nguyên thứ tự gửi lên."""
+    return list(dict.fromkeys(cid for cid in map(normalize_cccd, citizen_ids) if cid))
+
+
+def _result(cid: str, activities: Dict[str, List[dict]], certificates: Dict[str, List[dict]]) -> dict:
+    return {
+        "citizenId": cid,
+        "found": bool(activities[cid] or certificates[cid]),
+        "activities": activities[cid],
+        "certificates": certificates[cid],
+    }
+
+
+@router.post("/batch-lookup")
+async def batch_lookup(request: BatchLookupRequest,
+                       output_format: str = Query("json", alias="format")):
+    """Tra cứu hoạt động và chứng nhận của nhiều CCCD trong một request.
+
+    format=ndjson trả về dạng stream, mỗi dòng là kết quả của một CCCD.
+    """
+    if output_format not in BATCH_LOOKUP_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format phải là một trong: {', '.join(BATCH_LOOKUP_FORMATS)}")
+    citizen_ids = _unique_ids(request.citizenIds)
+    if not citizen_ids:
+        raise HTTPException(status_code=400, detail="Danh sách CCCD trống.")
+    if len(citizen_ids) > BATCH_LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Tối đa {BATCH_LOOKUP_MAX_IDS} CCCD mỗi request.")
+
+    try:
+        activities, certificates = await asyncio.gather(
+            run_sheets(find_many_in_sheet, ACTIVITY_SHEET_ID, citizen_ids),
+            run_sheets(find_many_in_sheet, CERTIFICATE_SHEET_ID, citizen_ids),
+        )
+    except HttpError as e:
+        raise HTTPException(status_code=502, detail=f"Không thể truy cập Google Sheet. Mã lỗi: {e.resp.status}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Google Sheets API không khả dụng.")
+
+    if output_format == "ndjson":
+        async def lines():
+            for start in range(0, len(citizen_ids), BATCH_LOOKUP_STREAM_CHUNK):
+                yield "".join(
+                    json.dumps(_result(cid, activities, certificates), ensure_ascii=False) + "\n"
+                    for cid in citizen_ids[start:start + BATCH_LOOKUP_STREAM_CHUNK]
+                ).encode("utf-8")
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = [_result(cid, activities, certificates) for cid in citizen_ids]
+    return {
+        "count": len(results),
+        "found": sum(result["found"] for result in results),
+        "results": results,
+    }
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.sqlite_db import CACHE_DB_PATH, SQLiteDatabase
+
+# Kho dùng chung cho ContentCache và SheetIndex. Với gunicorn, mỗi worker là một
+# tiến trình riêng; backend "sqlite" cho phép mọi worker trên cùng máy dùng chung
+# dữ liệu đã cào/đã đọc, và khóa theo key để chỉ một worker làm mới mỗi lúc.
+# Dữ liệu sheet (phần lớn bộ nhớ) được tra thẳng trong SQLite (SQLiteSheetStore), không
+# nạp vào từng worker; nội dung đã cào chỉ vài trăm KB nên mỗi worker vẫn giữ một bản
+# (kèm snapshot nén sẵn) để phục vụ không chạm đĩa.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+SHARED_LOCK_TTL_SECONDS = int(os.getenv("SHARED_LOCK_TTL_SECONDS", "120"))
+SHARED_WAIT_POLL_SECONDS = 0.2
+
+
+class CacheBackend:
+    """Giao diện backend: giá trị phải tuần tự hóa được bằng JSON."""
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(giá trị, thời điểm lưu) hoặc None."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        raise NotImplementedError
+
+    def try_lock(self, key: str, ttl_seconds: int = SHARED_LOCK_TTL_SECONDS) -> Optional[str]:
+        """Thử lấy khóa làm mới của key, không chờ. Trả về token để unlock, hoặc None."""
+        raise NotImplementedError
+
+    def unlock(self, key: str, token: str):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, key: str, ttl_seconds: int = SHARED_LOCK_TTL_SECONDS) -> Iterator[bool]:
+        """with backend.lock(key) as acquired: ... — acquired=False nếu nơi khác đang giữ khóa."""
+        token = self.try_lock(key, ttl_seconds)
+        try:
+            yield token is not None
+        finally:
+            if token is not None:
+                self.unlock(key, token)
+
+    def wait_for(self, key: str, newer_than: float,
+                 timeout: float = SHARED_LOCK_TTL_SECONDS) -> Optional[Tuple[Any, float]]:
+        """Chờ nơi đang giữ khóa ghi xong một giá trị mới hơn newer_than.
+
+        Trả về None nếu hết thời gian chờ hoặc khóa đã được nhả mà không có giá trị mới.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            item = self.get(key)
+            if item is not None and item[1] > newer_than:
+                return item
+            if not self.is_locked(key):
+                return None
+            time.sleep(SHARED_WAIT_POLL_SECONDS)
+        return None
+
+    def is_locked(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @property
+    def shared(self) -> bool:
+        """True nếu dữ liệu được dùng chung giữa các tiến trình."""
+        return False
+
+
+class MemoryBackend(CacheBackend):
+    """Backend trong tiến trình: không dùng chung giữa các worker."""
+
+    def __init__(self):
+        self._items: Dict[str, Tuple[Any, float]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            return self._items.get(key)
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        with self._lock:
+            self._items[key] = (value, stored_at or time.time())
+
+    def try_lock(self, key: str, ttl_seconds: int = SHARED_LOCK_TTL_SECONDS) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[1] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (token, now + ttl_seconds)
+            return token
+
+    def unlock(self, key: str, token: str):
+        with self._lock:
+            if self._locks.get(key, (None,))[0] == token:
+                del self._locks[key]
+
+    def is_locked(self, key: str) -> bool:
+        with self._lock:
+            held = self._locks.get(key)
+            return held is not None and held[1] > time.time()
+
+
+class SQLiteBackend(CacheBackend):
+    """Backend SQLite (WAL) dùng chung cho mọi worker trên cùng máy.
+
+    Giá trị lưu dạng JSON nén zlib. Khóa có hạn (ttl) để worker chết giữa chừng
+    không giữ khóa mãi.
+    """
+
+    def __init__(self, path: str = CACHE_DB_PATH):
+        self.path = path
+        self.db = SQLiteDatabase(path, schema=(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS locks ("
+            "key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)",
+        ))
+
+    @property
+    def shared(self) -> bool:
+        return True
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            row = self.db.connect().execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Lỗi đọc cache dùng chung '{key}': {e}", file=sys.stderr)
+            return None
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        try:
+            with self.db.connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, blob, stored_at or time.time()),
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ Lỗi ghi cache dùng chung '{key}': {e}", file=sys.stderr)
+
+    def try_lock(self, key: str, ttl_seconds: int = SHARED_LOCK_TTL_SECONDS) -> Optional[str]:
+        token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        now = time.time()
+        try:
+            with self.db.connect() as conn:
+                conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO locks (key, token, expires_at) VALUES (?, ?, ?)",
+                    (key, token, now + ttl_seconds),
+                )
+        except sqlite3.Error as e:
+            # Không khóa được thì tự làm mới như khi chạy một worker, thay vì đứng chờ.
+            print(f"⚠️ Lỗi khóa cache dùng chung '{key}': {e}", file=sys.stderr)
+            return token
+        return token if cursor.rowcount == 1 else None
+
+    def unlock(self, key: str, token: str):
+        try:
+            with self.db.connect() as conn:
+                conn.execute("DELETE FROM locks WHERE key = ? AND token = ?", (key, token))
+        except sqlite3.Error:
+            pass  # khóa tự hết hạn sau ttl
+
+    def is_locked(self, key: str) -> bool:
+        try:
+            row = self.db.connect().execute(
+                "SELECT 1 FROM locks WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None
+
+
+_default_backend: Optional[CacheBackend] = None
+_default_backend_lock = threading.Lock()
+
+
+def get_cache_backend() -> CacheBackend:
+    """Backend mặc định của tiến trình, chọn theo biến môi trường CACHE_BACKEND (sqlite | memory)."""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            if CACHE_BACKEND == "sqlite":
+                try:
+                    _default_backend = SQLiteBackend()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Không mở được cache dùng chung ({CACHE_DB_PATH}), "
+                          f"mỗi worker dùng cache riêng: {e}", file=sys.stderr)
+            if _default_backend is None:
+                _default_backend = MemoryBackend()
+        return _default_backend
@@ -0,0 +1,9 @@
+import os
+
+# Cấu hình dùng chung giữa scraper.py và các module trong src/. Để riêng ở đây (không
+# import gì nặng) để phần Sheets và main không phải nạp scraper chỉ vì một hằng số.
+
+# GOVOLUNTEER_BASE_URL cho phép trỏ sang bản sao cục bộ (ví dụ benchmarks/fake_site.py).
+BASE_URL = os.getenv("GOVOLUNTEER_BASE_URL", "https://govolunteerhcmc.vn")
+# Thư mục cho trạng thái cào /news và file cache SQLite.
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR", ".cache")
@@ -0,0 +1,162 @@
+import asyncio
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.cache_backend import CacheBackend, MemoryBackend
+from src.metrics import CACHE_REQUESTS
+from src.singleflight import SingleFlight
+from src.snapshots import Snapshot
+
+# Làm mới trước khi hết hạn: một entry được coi là "đến hạn" khi tuổi của nó
+# vượt quá REFRESH_AHEAD_RATIO * refresh_seconds.
+REFRESH_AHEAD_RATIO = 0.8
+SCHEDULER_TICK_SECONDS = 15
+
+
+class CacheEntry:
+    def __init__(self, fetcher: Callable[[], Any], refresh_seconds: int):
+        self.fetcher = fetcher
+        self.refresh_seconds = refresh_seconds
+        self.data: Any = None
+        self.snapshot: Optional[Snapshot] = None
+        self.fetched_at = 0.0
+        self.attempted_at = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at if self.fetched_at else 0.0
+
+    def store(self, data: Any, fetched_at: float):
+        # Tuần tự hóa + nén ngay khi làm mới (ở luồng nền), không phải ở mỗi request.
+        snapshot = Snapshot(data)
+        self.data, self.snapshot, self.fetched_at = data, snapshot, fetched_at
+        self.attempted_at = max(self.attempted_at, fetched_at)
+        self.last_error = None
+
+
+class ContentCache:
+    """Cache nội dung đã cào, khóa theo endpoint, theo kiểu stale-while-revalidate.
+
+    Request luôn nhận bản tốt gần nhất ngay lập tức; việc làm mới do scheduler
+    chạy nền đảm nhận. Khi nguồn lỗi, bản cũ được giữ lại thay vì bị xóa.
+
+    Với backend dùng chung (SQLite), các worker đọc bản mới nhất từ backend và
+    chỉ worker giữ khóa của key mới thực sự cào lại.
+    """
+
+    def __init__(self, single_flight: Optional[SingleFlight] = None,
+                 backend: Optional[CacheBackend] = None):
+        self._entries: Dict[str, CacheEntry] = {}
+        self._flight = single_flight or SingleFlight()
+        self._backend = backend or MemoryBackend()
+
+    def register(self, key: str, fetcher: Callable[[], Any], refresh_seconds: int):
+        self._entries[key] = CacheEntry(fetcher, refresh_seconds)
+
+    @staticmethod
+    def _adopt(entry: CacheEntry, item: Optional[Tuple[Any, float]]) -> bool:
+        """Dùng bản trong backend nếu nó mới hơn bản đang có."""
+        if item is None or not item[0] or item[1] <= entry.fetched_at:
+            return False
+        entry.store(*item)
+        return True
+
+    def _refresh_now(self, key: str) -> bool:
+        entry = self._entries[key]
+        shared_key = f"content:{key}"
+        item = self._backend.get(shared_key)
+        if item is not None and (entry.data is None
+                                 or time.time() - item[1] < entry.refresh_seconds * REFRESH_AHEAD_RATIO):
+            # Chưa có dữ liệu (vừa khởi động) hoặc worker khác vừa làm mới: dùng luôn.
+            if self._adopt(entry, item):
+                return True
+
+        with self._backend.lock(shared_key) as acquired:
+            if not acquired:
+                if entry.data is not None:
+                    return False  # worker khác đang cào; tick sau sẽ nhận bản mới
+                if self._adopt(entry, self._backend.wait_for(shared_key, entry.fetched_at)):
+                    return True
+            return self._fetch(key, entry, shared_key)
+
+    def _fetch(self, key: str, entry: CacheEntry, shared_key: str) -> bool:
+        try:
+            data = entry.fetcher()
+        except Exception as e:
+            data = None
+            entry.last_error = str(e)
+        entry.attempted_at = time.time()
+        if not data:
+            print(f"⚠️ Làm mới cache '{key}' thất bại, giữ bản cũ ({entry.age:.0f}s).", file=sys.stderr)
+            return False
+        entry.store(data, time.time())
+        self._backend.set(shared_key, data, entry.fetched_at)
+        return True
+
+    def refresh(self, key: str, wait: bool = False) -> bool:
+        """Làm mới một key. Các lời gọi đồng thời cùng key dùng chung một lần
+        fetch; với wait=False, lời gọi trùng sẽ bỏ qua ngay thay vì chờ."""
+        flight_key = (f"content_cache:{key}",)
+        if not wait and self._flight.in_flight(flight_key):
+            return False
+        return self._flight.do(flight_key, self._refresh_now, key)
+
+    def peek(self, key: str) -> Tuple[Any, float]:
+        """Như get() nhưng không bao giờ chặn: trả về (None, 0) nếu chưa có dữ liệu."""
+        entry = self._entries[key]
+        if entry.data is None:
+            CACHE_REQUESTS.inc(cache=f"content:{key}", result="miss")
+        else:
+            CACHE_REQUESTS.inc(cache=f"content:{key}", result="stale" if entry.age >= entry.refresh_seconds else "hit")
+        if (entry.data is not None and entry.age >= entry.refresh_seconds
+                and not self._flight.in_flight((f"content_cache:{key}",))):
+            # Scheduler bị trễ: tự làm mới nền, request hiện tại vẫn dùng bản cũ.
+            threading.Thread(target=self.refresh, args=(key,), daemon=True).start()
+        return entry.data, entry.age
+
+    def peek_snapshot(self, key: str) -> Tuple[Optional[Snapshot], float]:
+        """Như peek() nhưng trả về bản đã tuần tự hóa sẵn."""
+        self.peek(key)
+        entry = self._entries[key]
+        return entry.snapshot, entry.age
+
+    def get_snapshot(self, key: str) -> Tuple[Optional[Snapshot], float]:
+        """Như get() nhưng trả về bản đã tuần tự hóa sẵn."""
+        _, age = self.get(key)
+        return self._entries[key].snapshot, age
+
+    def get(self, key: str) -> Tuple[Any, float]:
+        """Trả về (dữ liệu, tuổi tính bằng giây). Chỉ chặn khi chưa từng có dữ liệu."""
+        entry = self._entries[key]
+        if entry.data is None:
+            self.refresh(key, wait=True)
+            return entry.data, entry.age
+        return self.peek(key)
+
+    def due_keys(self):
+        return [
+            key for key, entry in self._entries.items()
+            if entry.data is None or entry.age >= entry.refresh_seconds * REFRESH_AHEAD_RATIO
+        ]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            key: {
+                "cached": entry.data is not None,
+                "attempted": bool(entry.attempted_at),
+                "age_seconds": round(entry.age, 1),
+                "refresh_seconds": entry.refresh_seconds,
+                "last_error": entry.last_error,
+            }
+            for key, entry in self._entries.items()
+        }
+
+    async def run_scheduler(self, tick_seconds: int = SCHEDULER_TICK_SECONDS):
+        """Vòng lặp nền (chạy trong lifespan): lần lượt làm mới các entry đến hạn."""
+        while True:
+            for key in self.due_keys():
+                await asyncio.to_thread(self.refresh, key)
+            await asyncio.sleep(tick_seconds)
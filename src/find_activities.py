@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from src.sheets_utils import find_activity_info
+from src.async_io import run_sheets
 
 router = APIRouter()
 
@@ -8,8 +9,8 @@ class LookupRequest(BaseModel):
     citizenId: str
 
 @router.post("/find-activities")
-def find_activities(request: LookupRequest):
-    activity = find_activity_info( request.citizenId)
+async def find_activities(request: LookupRequest):
+    activity = await run_sheets(find_activity_info, request.citizenId)
     if not activity:
         raise HTTPException(status_code=404, detail="Không tìm thấy hoạt động.")
     return {"activities": [activity]}
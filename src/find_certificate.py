@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from src.sheets_utils import find_certificate_info
+from src.async_io import run_sheets
 
 router = APIRouter()
 
@@ -8,8 +9,8 @@ class LookupRequest(BaseModel):
     citizenId: str
 
 @router.post("/find-certificates")
-def find_certificates(request: LookupRequest):
-    cert = find_certificate_info( request.citizenId)
+async def find_certificates(request: LookupRequest):
+    cert = await run_sheets(find_certificate_info, request.citizenId)
     if not cert:
         raise HTTPException(status_code=404, detail="Không tìm thấy chứng nhận.")
     return {"certificates": [cert]}
\ No newline at end of file
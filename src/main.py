@@ -1,38 +1,189 @@
+import asyncio
+import functools
 import os
-import time
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
 
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
 # --- SCRAPER MODULE ---
-from scraper import scrape_news as fetch_news_from_source
-from scraper import scrape_article_with_requests as fetch_article_from_source
-from scraper import (
-    scrape_chuong_trinh_chien_dich_du_an,
-    scrape_skills,
-    scrape_ideas,
-    scrape_clubs,
-    BASE_URL,
+# scraper.py kéo theo lxml, requests và httpx (~150 ms import): chỉ nạp khi cào lần đầu
+# hoặc trong lúc làm nóng nền, không chặn worker khởi động hay các route Sheets.
+from src.config import BASE_URL
+
+_scraper_module = None
+
+def _scraper():
+    global _scraper_module
+    if _scraper_module is None:
+        import scraper
+        _scraper_module = scraper
+    return _scraper_module
+
+def _from_scraper(name: str) -> Callable:
+    def call(*args, **kwargs):
+        return getattr(_scraper(), name)(*args, **kwargs)
+    call.__name__ = name
+    return call
+
+fetch_news_from_source = _from_scraper("scrape_news_concurrent")
+fetch_article_from_source = _from_scraper("scrape_article_with_requests")
+scrape_chuong_trinh_chien_dich_du_an = _from_scraper("scrape_chuong_trinh_chien_dich_du_an")
+scrape_skills = _from_scraper("scrape_skills")
+scrape_ideas = _from_scraper("scrape_ideas")
+scrape_clubs = _from_scraper("scrape_clubs")
+
+async def fetch_article_async(url: str):
+    return await _scraper().scrape_article_async(url)
+
+async def close_async_client():
+    # Chưa từng cào (hoặc scraper còn đang import dở) thì không có client nào để đóng.
+    if _scraper_module is not None:
+        await _scraper_module.close_async_client()
+
+# --- GOOGLE SHEETS ---
+from src.sheets_utils import (
+    get_sheet_api,
+    get_sheet_index,
+    sheet_api_ready,
+    READONLY_SCOPES,
+    READWRITE_SCOPES,
+    ACTIVITY_SHEET_ID,
+    CERTIFICATE_SHEET_ID,
 )
 
+# --- CACHE ---
+from src.cache_backend import get_cache_backend
+from src.content_cache import ContentCache
+from src.article_cache import ArticleCache, article_key
+from src.async_io import run_sheets, run_slow_upstream
+from src.snapshots import snapshot_response
+from src.sheet_export import (
+    EXPORT_FORMATS,
+    iter_index_batches,
+    iter_row_batches,
+    project,
+    read_headers,
+    read_row_count,
+    stream_csv,
+    stream_json,
+    stream_ndjson,
+)
+from src.singleflight import SingleFlight
+from src.outbound import CircuitOpenError, breaker_stats
+
 # --- ROUTER MODULES ---
 from src.find_activities import router as activities_router
 from src.find_certificate import router as certificates_router
 from src.request_pdf import router as pdf_router
+from src.batch_lookup import router as batch_lookup_router
+from src.metrics import Gauge, MetricsMiddleware, render_metrics
+from src.profiler import router as profiler_router
+
+# ==========================================================================
+# --- 1. GOOGLE SHEETS SETUP ---
+# ==========================================================================
+sheet_api = None
+
+# Trạng thái khởi động nền cho /ready: None = đang chạy, True = xong, False = lỗi.
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "1") == "1"
+warmup: Dict[str, Optional[bool]] = {"sheets_clients": None, "sheet_indexes": None}
+
+def init_sheet_api():
+    """Dựng client Google Sheets dùng chung (đọc và ghi). Gọi lại an toàn: client đã có thì trả về ngay."""
+    global sheet_api
+    if sheet_api is None:
+        get_sheet_api(READWRITE_SCOPES)
+        sheet_api = get_sheet_api(READONLY_SCOPES)
+    return sheet_api
+
+def startup_event():
+    """Làm nóng worker ở luồng nền: import scraper, dựng client Google, nạp chỉ mục CCCD."""
+    _scraper()
+    print("🔧 Khởi tạo Google Sheets API...")
+    try:
+        init_sheet_api()
+        warmup["sheets_clients"] = True
+        print("✅ Kết nối Google Sheets thành công.")
+    except FileNotFoundError as e:
+        warmup["sheets_clients"] = False
+        print(f"❌ {e}")
+    except Exception as e:
+        warmup["sheets_clients"] = False
+        print(f"❌ Lỗi khi khởi tạo Google Sheets API: {e}")
+
+    if not warmup["sheets_clients"]:
+        warmup["sheet_indexes"] = False
+        return
+    try:
+        for spreadsheet_id in (ACTIVITY_SHEET_ID, CERTIFICATE_SHEET_ID):
+            get_sheet_index(spreadsheet_id).ensure_fresh(sheet_api)
+        warmup["sheet_indexes"] = True
+    except Exception as e:
+        warmup["sheet_indexes"] = False
+        print(f"❌ Lỗi khi nạp chỉ mục CCCD: {e}")
+
+# ==========================================================================
+# --- 2. CONTENT CACHE (STALE-WHILE-REVALIDATE) ---
+# ==========================================================================
+CACHE_DURATION_SECONDS = 1800  # 30 phút
+
+# Các request trùng key trong lúc đang cào sẽ chờ và dùng chung một lần fetch.
+single_flight = SingleFlight()
+fetch_article = single_flight.wrap("article", fetch_article_from_source)
+
+# Backend dùng chung (mặc định SQLite trong SCRAPER_CACHE_DIR): với nhiều worker
+# gunicorn, chỉ một worker cào lại mỗi key, các worker khác đọc kết quả từ đó.
+content_cache = ContentCache(single_flight, backend=get_cache_backend())
+Gauge("govolunteer_content_cache_age_seconds", "Tuổi của dữ liệu đã cào trong cache theo key.", ("key",),
+      callback=lambda: {(key,): stats["age_seconds"]
+                        for key, stats in content_cache.stats().items() if stats["cached"]})
+content_cache.register("news", single_flight.wrap("news", functools.partial(fetch_news_from_source, incremental=True)), CACHE_DURATION_SECONDS)
+content_cache.register("clubs", single_flight.wrap("clubs", scrape_clubs), CACHE_DURATION_SECONDS)
+content_cache.register("campaigns", single_flight.wrap("campaigns", scrape_chuong_trinh_chien_dich_du_an), CACHE_DURATION_SECONDS)
+content_cache.register("skills", single_flight.wrap("skills", scrape_skills), CACHE_DURATION_SECONDS)
+content_cache.register("ideas", single_flight.wrap("ideas", scrape_ideas), CACHE_DURATION_SECONDS)
+
+# Cache HTML bài viết (bộ nhớ + SQLite). Khi khởi động, nạp sẵn các bài mới nhất của /news.
+ARTICLE_WARM_START = os.getenv("ARTICLE_WARM_START", "1") == "1"
+ARTICLE_WARM_COUNT = 20
+
+article_cache = ArticleCache()
+
+def warm_article_cache():
+    news, _ = content_cache.get("news")
+    if not news:
+        return
+    links = [article["link"] for article in news[0]["articles"][:ARTICLE_WARM_COUNT]]
+    warmed = article_cache.warm(links, fetch_article)
+    print(f"🔥 Đã nạp sẵn {warmed}/{len(links)} bài viết vào cache.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Không chặn việc nhận request: client Google, chỉ mục và cache được làm nóng ở nền,
+    # /ready báo khi xong. Với PREWARM_ON_STARTUP=0, mọi thứ được dựng ở lần dùng đầu tiên.
+    tasks = [asyncio.create_task(content_cache.run_scheduler())]
+    if PREWARM_ON_STARTUP:
+        tasks.append(asyncio.create_task(asyncio.to_thread(startup_event)))
+    if ARTICLE_WARM_START:
+        tasks.append(asyncio.create_task(asyncio.to_thread(warm_article_cache)))
+    yield
+    for task in tasks:
+        task.cancel()
+    await close_async_client()
 
 # ==========================================================================
-# --- 1. INIT APP & CORS ---
+# --- 3. INIT APP & CORS ---
 # ==========================================================================
 app = FastAPI(
     title="GoVolunteer API (Scraper & Lookup)",
     description="API hợp nhất cho cả scrape và tra cứu từ Google Sheets",
     version="9.2.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -43,124 +194,196 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ==========================================================================
-# --- 2. GOOGLE SHEETS SETUP ---
-# ==========================================================================
-SERVICE_ACCOUNT_FILE = 'credentials.json'
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-ACTIVITY_SHEET_ID = '1BGbTI34I8H_cZaRey5UHuPkxZa1bMsk1JanXCZFdj3s'
-CERTIFICATE_SHEET_ID = '1uAVk9XZExLgCdfukYGxk8NSFh5CZtrfjS0gQtxjTQaQ'
-SHEET_NAME = 'Sheet1'
+# Đặt sau CORS để được gọi trước: đo cả thời gian của các middleware khác.
+app.add_middleware(MetricsMiddleware)
 
-sheet_api = None
+@app.exception_handler(asyncio.TimeoutError)
+async def upstream_timeout_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": "Hết thời gian chờ dịch vụ bên ngoài."})
 
-@app.on_event("startup")
-def startup_event():
-    global sheet_api
-    print("🔧 Khởi tạo Google Sheets API...")
-    try:
-        if os.path.exists(SERVICE_ACCOUNT_FILE):
-            creds = service_account.Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-            service = build('sheets', 'v4', credentials=creds)
-            sheet_api = service.spreadsheets()
-            print("✅ Kết nối Google Sheets thành công.")
-        else:
-            print(f"❌ Không tìm thấy file: {SERVICE_ACCOUNT_FILE}")
-    except Exception as e:
-        print(f"❌ Lỗi khi khởi tạo Google Sheets API: {e}")
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request, exc):
+    return JSONResponse(status_code=503, headers={"Retry-After": str(max(1, round(exc.retry_in)))},
+                        content={"detail": "Dịch vụ bên ngoài tạm thời không khả dụng, vui lòng thử lại sau."})
 
 # ==========================================================================
-# --- 3. SCRAPER ENDPOINTS ---
+# --- 4. SCRAPER ENDPOINTS ---
 # ==========================================================================
-cache = {"news_data": None, "last_fetched": 0}
-CACHE_DURATION_SECONDS = 1800  # 30 phút
+async def _cached_content(key: str, request: Request, error_detail: str) -> Response:
+    snapshot, age = content_cache.peek_snapshot(key)
+    if snapshot is None:
+        # Chưa có dữ liệu: cào lần đầu trên pool riêng, không chặn event loop.
+        snapshot, age = await run_slow_upstream(content_cache.get_snapshot, key)
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail=error_detail)
+    return snapshot_response(snapshot, request, age)
 
 @app.get("/")
-def read_root():
-    return {"status": "online", "message": "API GoVolunteer hoạt động"}
+async def read_root():
+    """Liveness: tiến trình còn sống. Dùng /ready để biết worker đã sẵn sàng nhận tải chưa."""
+    return {"status": "online", "message": "API GoVolunteer hoạt động", "sheets_api": sheet_api_ready()}
+
+@app.get("/ready")
+async def read_ready():
+    """Readiness: 200 khi các bước làm nóng đã chạy xong (kể cả khi có bước lỗi,
+    được liệt kê trong "degraded"); 503 khi còn bước đang chạy."""
+    cache_stats = content_cache.stats()
+    checks = dict(warmup) if PREWARM_ON_STARTUP else {}
+    checks.update({f"content:{key}": stats["cached"] if stats["attempted"] else None
+                   for key, stats in cache_stats.items()})
+    pending = [name for name, state in checks.items() if state is None]
+    degraded = [name for name, state in checks.items() if state is False]
+    body = {"ready": not pending, "pending": pending, "degraded": degraded}
+    return JSONResponse(status_code=200 if not pending else 503, content=body)
 
 @app.get("/news")
-def get_all_news():
-    current_time = time.time()
-    if cache["news_data"] and (current_time - cache["last_fetched"] < CACHE_DURATION_SECONDS):
-        return cache["news_data"]
-    data = fetch_news_from_source()
-    if not data:
-        raise HTTPException(status_code=503, detail="Không thể lấy dữ liệu tin tức.")
-    cache["news_data"] = data
-    cache["last_fetched"] = current_time
-    return data
+async def get_all_news(request: Request):
+    return await _cached_content("news", request, "Không thể lấy dữ liệu tin tức.")
 
 @app.get("/clubs")
-def get_clubs():
-    data = scrape_clubs()
-    if not data:
-        raise HTTPException(status_code=503, detail="Không thể lấy dữ liệu CLB.")
-    return data
+async def get_clubs(request: Request):
+    return await _cached_content("clubs", request, "Không thể lấy dữ liệu CLB.")
 
 @app.get("/chuong-trinh-chien-dich-du-an")
-def get_campaigns():
-    data = scrape_chuong_trinh_chien_dich_du_an()
-    if not data:
-        raise HTTPException(status_code=503, detail="Không thể lấy dữ liệu chương trình.")
-    return data
+async def get_campaigns(request: Request):
+    return await _cached_content("campaigns", request, "Không thể lấy dữ liệu chương trình.")
 
 @app.get("/skills")
-def get_skills():
-    data = scrape_skills()
-    if not data:
-        raise HTTPException(status_code=503, detail="Không thể lấy dữ liệu kỹ năng.")
-    return data
+async def get_skills(request: Request):
+    return await _cached_content("skills", request, "Không thể lấy dữ liệu kỹ năng.")
 
 @app.get("/ideas")
-def get_ideas():
-    data = scrape_ideas()
-    if not data:
-        raise HTTPException(status_code=503, detail="Không thể lấy dữ liệu ý tưởng.")
-    return data
+async def get_ideas(request: Request):
+    return await _cached_content("ideas", request, "Không thể lấy dữ liệu ý tưởng.")
+
+_BASE_PARTS = urlsplit(BASE_URL)
+
+def _is_source_url(url: str) -> bool:
+    """URL thuộc đúng website nguồn: cùng scheme và host như BASE_URL, không userinfo, không cổng lạ."""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return (parts.scheme, parts.netloc) == (_BASE_PARTS.scheme, _BASE_PARTS.netloc)
 
 @app.get("/article")
-def get_article_detail(url: str):
-    if not url or not url.startswith(BASE_URL):
+async def get_article_detail(url: str):
+    if not url or not _is_source_url(url):
         raise HTTPException(status_code=400, detail=f"URL phải bắt đầu bằng {BASE_URL}")
-    content = fetch_article_from_source(url)
+    # Query/fragment không đổi nội dung bài: cào và lưu theo URL đã bỏ chúng.
+    url = article_key(url)
+    content = article_cache.get(url, memory_only=True)
+    if content is None:
+        content = await run_slow_upstream(article_cache.get, url)
+    if content is None:
+        content = await single_flight.ado(("article", url), fetch_article_async, url)
+        if content is not None:
+            await run_slow_upstream(article_cache.put, url, content)
+    if content is None:
+        # Website nguồn lỗi: dùng bản đã hết hạn trên đĩa nếu còn.
+        content = await run_slow_upstream(article_cache.get_stale, url)
     if content is None:
         raise HTTPException(status_code=503, detail="Không thể lấy nội dung bài viết.")
     return {"html_content": content}
 
 # ==========================================================================
-# --- 4. ADMIN TOOLS: XEM TOÀN BỘ DỮ LIỆU ---
+# --- 5. ADMIN TOOLS: XEM TOÀN BỘ DỮ LIỆU ---
 # ==========================================================================
-def _get_all_sheet_data(spreadsheet_id: str) -> Dict[str, Any]:
-    if not sheet_api:
+SHEET_SOURCES = {"activities": ACTIVITY_SHEET_ID, "certificates": CERTIFICATE_SHEET_ID}
+
+@app.get("/stats")
+async def get_stats():
+    return {
+        "content_cache": content_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "article_cache": article_cache.stats(),
+        "cache_backend": type(get_cache_backend()).__name__,
+        "circuit_breakers": breaker_stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Số liệu của worker hiện tại theo định dạng văn bản của Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/all-data")
+async def get_all_data_for_auditing(
+    output_format: str = Query("json", alias="format"),
+    sheet: str = "all",
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    where: Optional[List[str]] = Query(None),
+):
+    """Xuất dữ liệu sheet dạng stream (json | ndjson | csv), đọc theo từng lô dòng.
+
+    offset/limit phân trang theo dòng dữ liệu; fields=CCCD,Email chỉ lấy các cột này.
+    where=Cột:giá trị (lặp lại được) lọc qua chỉ mục trong bộ nhớ thay vì đọc cả sheet.
+    """
+    try:
+        api = sheet_api or await run_sheets(init_sheet_api)
+    except asyncio.TimeoutError:
+        raise
+    except Exception:
         raise HTTPException(status_code=503, detail="Google Sheets API không khả dụng.")
+    if output_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format phải là một trong: {', '.join(EXPORT_FORMATS)}")
+    if sheet != "all" and sheet not in SHEET_SOURCES:
+        raise HTTPException(status_code=400, detail=f"sheet phải là 'all' hoặc một trong: {', '.join(SHEET_SOURCES)}")
+    if output_format == "csv" and sheet == "all":
+        raise HTTPException(status_code=400, detail="CSV chỉ xuất được một sheet, hãy chọn sheet=...")
+
+    filters = {}
+    for condition in where or []:
+        header, sep, value = condition.partition(":")
+        if not sep or not header.strip():
+            raise HTTPException(status_code=400, detail="where phải có dạng Cột:giá trị")
+        filters[header.strip()] = value
+
+    names = list(SHEET_SOURCES) if sheet == "all" else [sheet]
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
     try:
-        result = sheet_api.values().get(spreadsheetId=spreadsheet_id, range=SHEET_NAME).execute()
-        values = result.get("values", [])
-        if not values or len(values) < 2:
-            return {"count": 0, "headers": values[0] if values else [], "data": []}
-        headers = values[0]
-        records = [
-            {headers[i]: (row[i] if i < len(row) else "") for i in range(len(headers))}
-            for row in values[1:]
-        ]
-        return {"count": len(records), "headers": headers, "data": records}
+        if filters:
+            indexes = [get_sheet_index(SHEET_SOURCES[name]) for name in names]
+            await asyncio.gather(*(run_sheets(index.ensure_fresh, api) for index in indexes))
+            sources = {
+                name: (index.headers, project(index.headers, field_list),
+                       iter_index_batches(index, index.select(filters), offset, limit))
+                for name, index in zip(names, indexes)
+            }
+        else:
+            # Đọc tiêu đề và số dòng trước khi stream, để lỗi ở bước này vẫn trả về mã lỗi HTTP.
+            all_headers, row_counts = await asyncio.gather(
+                asyncio.gather(*(run_sheets(read_headers, api, SHEET_SOURCES[name]) for name in names)),
+                asyncio.gather(*(run_sheets(read_row_count, api, SHEET_SOURCES[name]) for name in names)),
+            )
+            sources = {
+                name: (headers, project(headers, field_list),
+                       iter_row_batches(api, SHEET_SOURCES[name], row_count, offset, limit))
+                for name, headers, row_count in zip(names, all_headers, row_counts)
+            }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (asyncio.TimeoutError, CircuitOpenError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/all-data")
-def get_all_data_for_auditing():
-    activities = _get_all_sheet_data(ACTIVITY_SHEET_ID)
-    certificates = _get_all_sheet_data(CERTIFICATE_SHEET_ID)
-    return {
-        "activities": activities,
-        "certificates": certificates
-    }
+    if output_format == "csv":
+        return StreamingResponse(
+            stream_csv(sources[sheet]),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{sheet}.csv"'},
+        )
+    if output_format == "ndjson":
+        return StreamingResponse(stream_ndjson(sources), media_type="application/x-ndjson")
+    return StreamingResponse(stream_json(sources), media_type="application/json")
 
 # ==========================================================================
-# --- 5. INCLUDE ROUTERS (TÁCH MODULE) ---
+# --- 6. INCLUDE ROUTERS (TÁCH MODULE) ---
 # ==========================================================================
 app.include_router(activities_router)
 app.include_router(certificates_router)
 app.include_router(pdf_router)
+app.include_router(batch_lookup_router)
+app.include_router(profiler_router)
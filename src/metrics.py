@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Metric tối giản theo định dạng văn bản của Prometheus, không cần thư viện ngoài.
+# Số liệu tính theo từng tiến trình: với nhiều worker gunicorn, mỗi lần scrape
+# /metrics nhận số liệu của worker xử lý request đó.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Gauge tính lúc scrape: callback trả về {tuple nhãn: giá trị}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _samples(self):
+        if self.callback is None:
+            return
+        for key, value in sorted(self.callback().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # nhãn -> [số đếm theo bucket (không cộng dồn)..., +Inf, tổng]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# --- Các metric của service ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "govolunteer_http_request_duration_seconds", "Thời gian xử lý request theo route.",
+    ("method", "route", "status"))
+UPSTREAM_FETCH_SECONDS = Histogram(
+    "govolunteer_upstream_fetch_seconds", "Thời gian tải một trang từ website nguồn.", ("client",))
+HTML_PARSE_SECONDS = Histogram(
+    "govolunteer_html_parse_seconds", "Thời gian phân tích HTML theo hàm parse.", ("parser",))
+SHEETS_CALL_SECONDS = Histogram(
+    "govolunteer_sheets_call_seconds", "Thời gian các thao tác Google Sheets.", ("operation",))
+UPSTREAM_ERRORS = Counter(
+    "govolunteer_upstream_errors_total", "Số lỗi khi gọi upstream, theo loại (error | timeout | circuit_open).",
+    ("upstream", "kind"))
+CACHE_REQUESTS = Counter(
+    "govolunteer_cache_requests_total", "Số lần tra cache theo kết quả.", ("cache", "result"))
+OUTBOUND_RETRY_ATTEMPTS = Counter(
+    "govolunteer_outbound_retries_total", "Số lần thử lại lời gọi ra ngoài theo host.", ("host",))
+THREADPOOL_WAIT_SECONDS = Histogram(
+    "govolunteer_threadpool_queue_wait_seconds", "Thời gian chờ trong hàng đợi của pool luồng.", ("pool",))
+
+
+class MetricsMiddleware:
+    """ASGI middleware đo thời gian mỗi request (tới khi gửi xong body, kể cả stream).
+
+    Nhãn route là mẫu đường dẫn (vd. /article), không phải URL thật, để số nhãn có giới hạn.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=scope["method"],
+                route=getattr(route, "path", "unmatched"), status=status)
+
+
+@contextmanager
+def track_upstream(histogram: Histogram, upstream: str,
+                   timeout_errors: Tuple[type, ...] = (TimeoutError,), **labels):
+    """Đo thời gian một lời gọi upstream và đếm lỗi (timeout tách riêng); lỗi vẫn được ném tiếp."""
+    start = time.perf_counter()
+    try:
+        yield
+    except timeout_errors:
+        UPSTREAM_ERRORS.inc(upstream=upstream, kind="timeout")
+        raise
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream=upstream, kind="error")
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from urllib.parse import urlsplit
+
+from src.metrics import OUTBOUND_RETRY_ATTEMPTS, UPSTREAM_ERRORS, Gauge
+
+# Lớp gọi ra ngoài dùng chung cho website nguồn và Google APIs:
+# - timeout kết nối và timeout đọc tách riêng (kết nối treo bị bỏ sau vài giây);
+# - retry có jitter theo cấp số nhân, chỉ cho lời gọi đọc (idempotent), trong một
+#   hạn tổng OUTBOUND_DEADLINE_SECONDS để độ trễ đuôi có giới hạn;
+# - circuit breaker theo host: sau BREAKER_FAILURE_THRESHOLD lỗi liên tiếp, mọi lời
+#   gọi tới host đó ném CircuitOpenError ngay, để nơi gọi dùng bản tốt gần nhất.
+OUTBOUND_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OUTBOUND_CONNECT_TIMEOUT_SECONDS", "3"))
+OUTBOUND_READ_TIMEOUT_SECONDS = float(os.getenv("OUTBOUND_READ_TIMEOUT_SECONDS", "10"))
+OUTBOUND_RETRIES = int(os.getenv("OUTBOUND_RETRIES", "2"))
+OUTBOUND_DEADLINE_SECONDS = float(os.getenv("OUTBOUND_DEADLINE_SECONDS", "25"))
+OUTBOUND_BACKOFF_BASE_SECONDS = 0.25
+OUTBOUND_BACKOFF_MAX_SECONDS = 4.0
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "15"))
+# Mỗi lần thử lại (half-open) thất bại, thời gian mở mạch tăng gấp đôi tới mức này.
+BREAKER_MAX_RESET_SECONDS = 300.0
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Host đang bị ngắt mạch: lời gọi bị từ chối ngay, không chạm mạng."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Mạch tới {host} đang mở, thử lại sau {retry_in:.0f}s.")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Breaker ba trạng thái cho một host: closed -> open -> half_open -> closed.
+
+    Ở half_open chỉ một lời gọi thăm dò được đi qua; nếu nó lỗi, mạch mở lại với
+    thời gian chờ gấp đôi (thích nghi theo độ dài sự cố).
+    """
+
+    def __init__(self, host: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS,
+                 max_reset_seconds: float = BREAKER_MAX_RESET_SECONDS):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.reset_after = reset_seconds
+        self.probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Ném CircuitOpenError nếu lời gọi không được phép đi qua."""
+        now = time.time()
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                retry_in = self.opened_at + self.reset_after - now
+                if retry_in > 0:
+                    raise CircuitOpenError(self.host, retry_in)
+                self.state = HALF_OPEN
+            elif now - self.probe_started_at < self.reset_after:
+                # Đang có lời gọi thăm dò; nếu nó bị hủy giữa chừng thì sau reset_after
+                # lời gọi kế tiếp được thăm dò thay.
+                raise CircuitOpenError(self.host, self.probe_started_at + self.reset_after - now)
+            self.probe_started_at = now
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"✅ Mạch tới {self.host} đóng lại.")
+            self.state = CLOSED
+            self.failures = 0
+            self.reset_after = self.reset_seconds
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.reset_after = min(self.reset_after * 2, self.max_reset_seconds)
+            else:
+                self.failures += 1
+                if self.state == OPEN or self.failures < self.failure_threshold:
+                    return
+            self.state = OPEN
+            self.opened_at = time.time()
+            print(f"⚠️ Mở mạch tới {self.host} trong {self.reset_after:.0f}s.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "reset_seconds": self.reset_after,
+                "retry_in": round(max(0.0, self.opened_at + self.reset_after - time.time()), 1)
+                if self.state == OPEN else 0.0,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: breaker.stats() for breaker in breakers}
+
+
+def _breaker_states() -> Dict[Tuple[str, ...], float]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {(breaker.host,): _STATE_VALUES[breaker.state] for breaker in breakers}
+
+
+Gauge("govolunteer_circuit_breaker_state", "Trạng thái circuit breaker theo host (0 closed, 1 half-open, 2 open).",
+      ("host",), callback=_breaker_states)
+
+
+@contextmanager
+def guard(host: str, is_failure: Callable[[BaseException], bool]):
+    """Cho một lời gọi đi qua breaker của host và ghi nhận kết quả.
+
+    Lỗi mà is_failure() coi là do upstream (timeout, lỗi kết nối, 5xx, 429) mới
+    tính vào breaker; lỗi khác (vd. 404) nghĩa là host vẫn trả lời bình thường.
+    """
+    breaker = get_breaker(host)
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        UPSTREAM_ERRORS.inc(upstream=host, kind="circuit_open")
+        raise
+    try:
+        yield
+    except Exception as e:
+        if is_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: ngẫu nhiên trong [0, base * 2^attempt], chặn trên ở OUTBOUND_BACKOFF_MAX_SECONDS."""
+    return random.uniform(0, min(OUTBOUND_BACKOFF_MAX_SECONDS, OUTBOUND_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _retry_delay(e: BaseException, attempt: int, started: float, retries: int,
+                 is_failure: Callable[[BaseException], bool]) -> float:
+    """Thời gian chờ trước lần thử kế tiếp, hoặc -1 nếu không thử lại nữa."""
+    if attempt >= retries or isinstance(e, CircuitOpenError) or not is_failure(e):
+        return -1
+    delay = backoff_delay(attempt)
+    if time.monotonic() - started + delay >= OUTBOUND_DEADLINE_SECONDS:
+        return -1
+    return delay
+
+
+def call(host: str, fn: Callable, *args, is_failure: Callable[[BaseException], bool],
+         idempotent: bool = True, retries: int = OUTBOUND_RETRIES) -> Any:
+    """Gọi fn(*args) qua breaker của host; lời gọi idempotent được thử lại khi upstream lỗi."""
+    retries = retries if idempotent else 0
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            with guard(host, is_failure):
+                return fn(*args)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, started, retries, is_failure)
+            if delay < 0:
+                raise
+        OUTBOUND_RETRY_ATTEMPTS.inc(host=host)
+        attempt += 1
+        time.sleep(delay)
+
+
+async def acall(host: str, fn: Callable[..., Awaitable], *args, is_failure: Callable[[BaseException], bool],
+                idempotent: bool = True, retries: int = OUTBOUND_RETRIES) -> Any:
+    """Bản async của call(): await fn(*args), chờ giữa các lần thử bằng asyncio.sleep."""
+    retries = retries if idempotent else 0
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            with guard(host, is_failure):
+                return await fn(*args)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, started, retries, is_failure)
+            if delay < 0:
+                raise
+        OUTBOUND_RETRY_ATTEMPTS.inc(host=host)
+        attempt += 1
+        await asyncio.sleep(delay)
@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+# Profiler lấy mẫu (wall-clock) bật/tắt lúc đang chạy: một luồng nền định kỳ chụp
+# stack của mọi luồng và đếm theo dạng "collapsed stacks" (dùng được với
+# flamegraph.pl hoặc speedscope). Các endpoint chỉ tồn tại khi PROFILER_ENDPOINTS=1.
+PROFILER_ENDPOINTS = os.getenv("PROFILER_ENDPOINTS", "0") == "1"
+PROFILER_DEFAULT_INTERVAL_MS = 10
+PROFILER_MAX_SECONDS = 600
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self.interval_seconds = PROFILER_DEFAULT_INTERVAL_MS / 1000
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: int = PROFILER_DEFAULT_INTERVAL_MS, seconds: int = 60) -> bool:
+        """Bắt đầu lấy mẫu (xóa mẫu cũ); tự dừng sau `seconds`. False nếu đang chạy."""
+        with self._lock:
+            if self.running:
+                return False
+            self.samples = Counter()
+            self.interval_seconds = interval_ms / 1000
+            self.started_at, self.stopped_at = time.time(), 0.0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(seconds,), name="profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        # Luồng lấy mẫu tự thoát trong vòng một chu kỳ; không join để khỏi chặn event loop.
+        self._stop.set()
+
+    def _run(self, seconds: int):
+        own_id = threading.get_ident()
+        deadline = time.time() + seconds
+        while not self._stop.wait(self.interval_seconds) and time.time() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+        self.stopped_at = time.time()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            samples = self.samples.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in samples)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval_seconds * 1000,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": sum(self.samples.values()),
+        }
+
+
+profiler = SamplingProfiler()
+router = APIRouter(prefix="/debug/profiler")
+
+
+def _require_enabled():
+    if not PROFILER_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.post("/start")
+async def start_profiler(interval_ms: int = Query(PROFILER_DEFAULT_INTERVAL_MS, ge=1, le=1000),
+                         seconds: int = Query(60, ge=1, le=PROFILER_MAX_SECONDS)):
+    _require_enabled()
+    if not profiler.start(interval_ms, seconds):
+        raise HTTPException(status_code=409, detail="Profiler đang chạy.")
+    return profiler.stats()
+
+
+@router.post("/stop")
+async def stop_profiler():
+    _require_enabled()
+    profiler.stop()
+    return profiler.stats()
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_profile():
+    """Kết quả dạng collapsed stacks: mỗi dòng `luồng;hàm (file:dòng);... số_mẫu`."""
+    _require_enabled()
+    return PlainTextResponse(profiler.collapsed())
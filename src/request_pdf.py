@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from src.sheets_utils import update_pdf_requested
+from src.sheets_utils import update_pdf_requested_async
 
 router = APIRouter()
 
@@ -10,8 +10,8 @@ class PDFRequest(BaseModel):
 
 
 @router.post("/request-pdf")
-def request_pdf(data: PDFRequest):
-    updated = update_pdf_requested(data.citizenId, data.email)
+async def request_pdf(data: PDFRequest):
+    updated = await update_pdf_requested_async(data.citizenId, data.email)
     
     if not updated:
         raise HTTPException(status_code=404, detail="Không tìm thấy bản ghi với CCCD cung cấp để cập nhật.")
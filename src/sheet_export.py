@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from src.async_io import run_sheets
+from src.sheets_utils import SHEET_NAME, SHEETS_READ_RETRIES, sheets_call
+
+# Xuất dữ liệu sheet theo từng lô dòng, mã hóa và gửi ngay từng lô: bộ nhớ
+# không phụ thuộc vào kích thước sheet.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+EXPORT_FORMATS = ("json", "ndjson", "csv")
+
+
+def _read_range(sheet_api, spreadsheet_id: str, a1: str) -> List[List[str]]:
+    with sheets_call("export_read_range"):
+        result = sheet_api.values().get(spreadsheetId=spreadsheet_id, range=f"{SHEET_NAME}!{a1}").execute(
+            num_retries=SHEETS_READ_RETRIES)
+    return result.get("values", [])
+
+
+def read_headers(sheet_api, spreadsheet_id: str) -> List[str]:
+    rows = _read_range(sheet_api, spreadsheet_id, "1:1")
+    return rows[0] if rows else []
+
+
+def read_row_count(sheet_api, spreadsheet_id: str) -> int:
+    """Số dòng của lưới sheet (gridProperties.rowCount), tính cả các dòng trống ở cuối."""
+    with sheets_call("export_row_count"):
+        result = sheet_api.get(
+            spreadsheetId=spreadsheet_id, ranges=[SHEET_NAME],
+            fields="sheets.properties.gridProperties.rowCount",
+        ).execute(num_retries=SHEETS_READ_RETRIES)
+    sheets = result.get("sheets") or [{}]
+    return sheets[0].get("properties", {}).get("gridProperties", {}).get("rowCount", 0)
+
+
+def project(headers: List[str], fields: Optional[List[str]]) -> List[int]:
+    """Chỉ số các cột cần xuất; ném ValueError nếu có tên cột không tồn tại."""
+    if not fields:
+        return list(range(len(headers)))
+    missing = [field for field in fields if field not in headers]
+    if missing:
+        raise ValueError(f"Không có cột: {', '.join(missing)}")
+    return [headers.index(field) for field in fields]
+
+
+async def iter_row_batches(sheet_api, spreadsheet_id: str, row_count: int, offset: int = 0,
+                           limit: Optional[int] = None,
+                           batch_rows: int = EXPORT_BATCH_ROWS) -> AsyncIterator[List[List[str]]]:
+    """Đọc các dòng dữ liệu (bỏ dòng tiêu đề) theo từng range `N:M`, mỗi lần một lô.
+
+    row_count (từ read_row_count) là điểm dừng: một range trống chưa chắc là hết
+    sheet, vì giữa sheet có thể có cả lô dòng trống.
+
+    Lỗi khi đọc một lô giữa chừng chỉ làm đứt stream: status 200 đã được gửi cùng
+    các lô trước, nên client nhận nội dung bị cắt (JSON không hợp lệ) thay vì lỗi 5xx.
+    """
+    next_row = offset + 2
+    end_row = row_count if limit is None else min(row_count, offset + 1 + limit)
+    pending_blank = 0
+    while next_row <= end_row:
+        last_row = min(next_row + batch_rows - 1, end_row)
+        rows = await run_sheets(_read_range, sheet_api, spreadsheet_id, f"{next_row}:{last_row}")
+        if rows:
+            if pending_blank:
+                # Sheets bỏ các dòng trống ở cuối range; nếu sau đó vẫn còn dữ liệu thì
+                # đó là dòng trống thật ở giữa sheet, vẫn phải xuất như trước đây.
+                yield [[] for _ in range(pending_blank)]
+                pending_blank = 0
+            yield rows
+        pending_blank += last_row - next_row + 1 - len(rows)
+        next_row = last_row + 1
+    # Trang (limit) kết thúc bằng dòng trống: chỉ xuất chúng nếu sau trang còn dữ liệu.
+    while pending_blank and next_row <= row_count:
+        last_row = min(next_row + batch_rows - 1, row_count)
+        if await run_sheets(_read_range, sheet_api, spreadsheet_id, f"{next_row}:{last_row}"):
+            yield [[] for _ in range(pending_blank)]
+            return
+        next_row = last_row + 1
+
+
+async def iter_index_batches(index, row_ids: List[int], offset: int = 0, limit: Optional[int] = None,
+                             batch_rows: int = EXPORT_BATCH_ROWS) -> AsyncIterator[List[List[str]]]:
+    """Như iter_row_batches nhưng lấy các dòng đã lọc từ SheetIndex trong bộ nhớ."""
+    row_ids = row_ids[offset:] if limit is None else row_ids[offset:offset + limit]
+    for start in range(0, len(row_ids), batch_rows):
+        yield index.rows_for(row_ids[start:start + batch_rows])
+
+
+def _records(headers: List[str], columns: List[int], rows: List[List[str]]) -> List[Dict[str, str]]:
+    return [{headers[i]: (row[i] if i < len(row) else "") for i in columns} for row in rows]
+
+
+# Mỗi nguồn là (headers, chỉ số cột cần xuất, async iterator các lô dòng).
+Source = Tuple[List[str], List[int], AsyncIterator[List[List[str]]]]
+
+
+async def stream_json(sources: Dict[str, Source]) -> AsyncIterator[bytes]:
+    """{"<tên>": {"headers": [...], "data": [...], "count": N}, ...}, gửi dần từng lô."""
+    yield b"{"
+    for n, (name, (headers, columns, batches)) in enumerate(sources.items()):
+        selected = [headers[i] for i in columns]
+        yield (("," if n else "") + json.dumps(name) + ':{"headers":'
+               + json.dumps(selected, ensure_ascii=False) + ',"data":[').encode("utf-8")
+        count = 0
+        async for rows in batches:
+            if not rows:
+                continue
+            chunk = ",".join(json.dumps(record, ensure_ascii=False) for record in _records(headers, columns, rows))
+            yield (("," if count else "") + chunk).encode("utf-8")
+            count += len(rows)
+        yield f'],"count":{count}}}'.encode("utf-8")
+    yield b"}"
+
+
+async def stream_ndjson(sources: Dict[str, Source]) -> AsyncIterator[bytes]:
+    """Mỗi dòng một JSON: {"sheet": "<tên>", "record": {...}}."""
+    for name, (headers, columns, batches) in sources.items():
+        async for rows in batches:
+            yield "".join(
+                json.dumps({"sheet": name, "record": record}, ensure_ascii=False) + "\n"
+                for record in _records(headers, columns, rows)
+            ).encode("utf-8")
+
+
+async def stream_csv(source: Source) -> AsyncIterator[bytes]:
+    headers, columns, batches = source
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([headers[i] for i in columns])
+    async for rows in batches:
+        writer.writerows([(row[i] if i < len(row) else "") for i in columns] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
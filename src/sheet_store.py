@@ -0,0 +1,333 @@
+import bisect
+import json
+import sqlite3
+from array import array
+from operator import itemgetter
+from typing import Dict, Iterable, List, Sequence, Union
+
+# Giá trị của chỉ mục: số dòng (int) nếu giá trị là duy nhất, hoặc array('l') các dòng.
+Postings = Union[int, array]
+
+# Cột có ít giá trị khác nhau (hoạt động, ngày, TRUE/FALSE...) được gộp: các ô giống
+# nhau dùng chung một đối tượng str thay vì mỗi ô một bản sao do JSON parser tạo ra.
+DEDUP_MAX_DISTINCT_RATIO = 0.5
+
+
+def normalize_value(value: str) -> str:
+    return value.strip()
+
+
+def _compact(column: Sequence[str]) -> List[str]:
+    if len(set(column)) > DEDUP_MAX_DISTINCT_RATIO * len(column):
+        return list(column)
+    canonical: Dict[str, str] = {}
+    return [canonical.setdefault(value, value) for value in column]
+
+
+class ColumnStore:
+    """Dữ liệu một sheet lưu theo cột: mỗi cột là một list str, không có dict theo dòng.
+
+    Bản ghi {tiêu đề: giá trị} chỉ được dựng cho những dòng thực sự trả về. Chỉ mục
+    phụ (giá trị đã chuẩn hóa -> các dòng) được dựng sẵn cho các cột chỉ định, các
+    cột khác dựng khi được lọc lần đầu. Không tự khóa: SheetIndex lo việc đồng bộ.
+    """
+
+    def __init__(self, headers: Sequence[str], columns: List[List[str]],
+                 indexed: Iterable[str] = ()):
+        self.headers = list(headers)
+        self.columns = columns
+        self.size = len(columns[0]) if columns else 0
+        # Tiêu đề trùng tên: như headers.index(), cột đầu tiên được dùng.
+        self._positions: Dict[str, int] = {}
+        for position, header in enumerate(self.headers):
+            self._positions.setdefault(header, position)
+        # Cột gần như duy nhất (CCCD) lưu thẳng số dòng; giá trị lặp lại lưu array('l')
+        # (8 byte mỗi dòng, không tạo đối tượng int cho từng dòng).
+        self._indexes: Dict[str, Dict[str, Postings]] = {}
+        for header in indexed:
+            if header in self._positions:
+                self._index(header)
+
+    @classmethod
+    def from_rows(cls, headers: Sequence[str], rows: List[List[str]],
+                  indexed: Iterable[str] = ()) -> "ColumnStore":
+        # Sheets API bỏ các ô trống ở cuối dòng: bù '' rồi tách từng cột bằng itemgetter (chạy trong C).
+        width = len(headers)
+        rows = [row if len(row) >= width else row + [''] * (width - len(row)) for row in rows]
+        columns = [_compact(list(map(itemgetter(j), rows))) for j in range(width)]
+        return cls(headers, columns, indexed)
+
+    @classmethod
+    def from_json(cls, value: dict, indexed: Iterable[str] = ()) -> "ColumnStore":
+        """Dựng lại từ to_json() (vd. bản do worker khác lưu trong cache dùng chung)."""
+        return cls(value['headers'], [_compact(column) for column in value['columns']], indexed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def position(self, header: str) -> int:
+        """Vị trí cột; ném ValueError nếu không có (như list.index)."""
+        try:
+            return self._positions[header]
+        except KeyError:
+            raise ValueError(f"Không có cột: {header}") from None
+
+    def _index(self, header: str) -> Dict[str, Postings]:
+        index = self._indexes.get(header)
+        if index is None:
+            first: Dict[str, int] = {}
+            repeats: Dict[str, List[int]] = {}
+            for i, value in enumerate(self.columns[self.position(header)]):
+                if first.setdefault(value, i) != i:
+                    repeats.setdefault(value, []).append(i)
+            # Chỉ chuẩn hóa mỗi giá trị khác nhau một lần.
+            index = {}
+            for value, i in first.items():
+                key = normalize_value(value)
+                if not key:
+                    continue
+                if key in index or value in repeats:
+                    merged = sorted([*self._rows(index.get(key)), i, *repeats.get(value, ())])
+                    index[key] = array('l', merged)
+                else:
+                    index[key] = i
+            self._indexes[header] = index
+        return index
+
+    @staticmethod
+    def _rows(postings: Union[Postings, None]) -> Sequence[int]:
+        if postings is None:
+            return ()
+        return (postings,) if isinstance(postings, int) else postings
+
+    def lookup(self, header: str, value: str) -> Sequence[int]:
+        """Các dòng (0-based) có ô `header` bằng `value` sau khi chuẩn hóa."""
+        return self._rows(self._index(header).get(normalize_value(value)))
+
+    def lookup_many(self, header: str, values: Iterable[str]) -> Dict[str, Sequence[int]]:
+        """{giá trị đã chuẩn hóa: các dòng} cho nhiều giá trị một lúc."""
+        return {key: self.lookup(header, key) for key in map(normalize_value, values)}
+
+    def select(self, filters: Dict[str, str]) -> List[int]:
+        """Các dòng thỏa mọi điều kiện {tiêu đề: giá trị}, theo thứ tự trong sheet."""
+        if not filters:
+            return list(range(self.size))
+        matches = sorted((self.lookup(header, value) for header, value in filters.items()), key=len)
+        result = set(matches[0])
+        for rows in matches[1:]:
+            result.intersection_update(rows)
+        return sorted(result)
+
+    def record(self, i: int) -> Dict[str, str]:
+        return {header: column[i] for header, column in zip(self.headers, self.columns)}
+
+    def row(self, i: int) -> List[str]:
+        return [column[i] for column in self.columns]
+
+    def rows(self, row_ids: Sequence[int]) -> List[List[str]]:
+        return [self.row(i) for i in row_ids if 0 <= i < self.size]
+
+    def records(self, row_ids: Sequence[int]) -> List[Dict[str, str]]:
+        return [self.record(i) for i in row_ids]
+
+    def set_value(self, i: int, header: str, value: str) -> bool:
+        if header not in self._positions or not 0 <= i < self.size:
+            return False
+        column = self.columns[self._positions[header]]
+        index = self._indexes.get(header)
+        if index is not None:
+            old, new = normalize_value(column[i]), normalize_value(value)
+            if old:
+                rows = [row for row in self._rows(index.get(old)) if row != i]
+                if rows:
+                    index[old] = rows[0] if len(rows) == 1 else array('l', rows)
+                else:
+                    index.pop(old, None)
+            if new:
+                rows = list(self._rows(index.get(new)))
+                bisect.insort(rows, i)
+                index[new] = rows[0] if len(rows) == 1 else array('l', rows)
+        column[i] = value
+        return True
+
+    def to_json(self) -> dict:
+        return {'headers': self.headers, 'columns': self.columns}
+
+
+# Bảng cho SQLiteSheetStore, nằm trong file cache SQLite dùng chung (src/sqlite_db.py).
+# Mỗi lần nạp sheet là một phiên bản mới; dòng và chỉ mục gắn với phiên bản đó.
+SQLITE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sheet_versions ("
+    "version INTEGER PRIMARY KEY AUTOINCREMENT, sheet TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS sheet_rows ("
+    "version INTEGER NOT NULL, row INTEGER NOT NULL, cells TEXT NOT NULL, PRIMARY KEY (version, row))",
+    "CREATE TABLE IF NOT EXISTS sheet_keys ("
+    "version INTEGER NOT NULL, header TEXT NOT NULL, value TEXT NOT NULL, row INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS sheet_keys_lookup ON sheet_keys (version, header, value)",
+)
+# Số dòng ghi trong một transaction khi nạp: không giữ khóa ghi của cả file quá lâu.
+SQLITE_WRITE_CHUNK_ROWS = 5000
+# Giới hạn số tham số trong một câu IN (...): SQLite từ 3.32 cho phép 32766, bản cũ hơn 999.
+SQLITE_MAX_PARAMS = 30000 if sqlite3.sqlite_version_info >= (3, 32) else 900
+# Kết quả nhiều dòng được gom thành một chuỗi JSON ngay trong SQLite (json_group_array):
+# sqlite3 nhả GIL ở mỗi bước đọc một dòng, và khi luồng event loop đang bận (vd. dựng
+# JSON response lớn) mỗi lần lấy lại GIL phải chờ, nên đọc 1000 dòng từng dòng một
+# chậm hơn nhiều so với một bước duy nhất.
+
+
+class SQLiteSheetStore:
+    """Cùng giao diện đọc/ghi với ColumnStore, nhưng dữ liệu nằm trong SQLite dùng chung.
+
+    Mọi worker trên máy đọc cùng một bản trên đĩa; mỗi worker chỉ giữ tiêu đề và số
+    phiên bản, nên bộ nhớ không tăng theo số worker. Cột trong `indexed` được tra qua
+    bảng sheet_keys; lọc theo cột khác thì quét các dòng.
+    """
+
+    def __init__(self, db, version: int, headers: Sequence[str], size: int,
+                 indexed: Iterable[str] = ()):
+        self.db = db
+        self.version = version
+        self.headers = list(headers)
+        self.size = size
+        self._positions: Dict[str, int] = {}
+        for position, header in enumerate(self.headers):
+            self._positions.setdefault(header, position)
+        self.indexed = {header for header in indexed if header in self._positions}
+
+    @classmethod
+    def create(cls, db, sheet: str, headers: Sequence[str], rows: List[List[str]],
+               indexed: Iterable[str] = ()) -> "SQLiteSheetStore":
+        """Ghi một phiên bản mới của sheet rồi xóa các phiên bản cũ hơn phiên bản liền trước
+        (worker chưa kịp chuyển sang bản mới vẫn đọc được bản đang dùng)."""
+        width = len(headers)
+        with db.connect() as conn:
+            version = conn.execute("INSERT INTO sheet_versions (sheet) VALUES (?)", (sheet,)).lastrowid
+        store = cls(db, version, headers, len(rows), indexed)
+        positions = [(header, store._positions[header]) for header in store.indexed]
+        for start in range(0, len(rows), SQLITE_WRITE_CHUNK_ROWS):
+            chunk = [row if len(row) >= width else row + [''] * (width - len(row))
+                     for row in rows[start:start + SQLITE_WRITE_CHUNK_ROWS]]
+            keys = [(version, header, normalize_value(row[position]), i)
+                    for i, row in enumerate(chunk, start) for header, position in positions
+                    if normalize_value(row[position])]
+            with db.connect() as conn:
+                conn.executemany("INSERT INTO sheet_rows (version, row, cells) VALUES (?, ?, ?)",
+                                 [(version, i, json.dumps(row, ensure_ascii=False))
+                                  for i, row in enumerate(chunk, start)])
+                conn.executemany("INSERT INTO sheet_keys (version, header, value, row) VALUES (?, ?, ?, ?)", keys)
+        with db.connect() as conn:
+            previous = conn.execute(
+                "SELECT version FROM sheet_versions WHERE sheet = ? AND version < ? "
+                "ORDER BY version DESC LIMIT 1", (sheet, version)).fetchone()
+            if previous is not None:
+                old = "SELECT version FROM sheet_versions WHERE sheet = ? AND version < ?"
+                conn.execute(f"DELETE FROM sheet_rows WHERE version IN ({old})", (sheet, previous[0]))
+                conn.execute(f"DELETE FROM sheet_keys WHERE version IN ({old})", (sheet, previous[0]))
+                conn.execute("DELETE FROM sheet_versions WHERE sheet = ? AND version < ?", (sheet, previous[0]))
+        return store
+
+    @classmethod
+    def from_json(cls, db, value: dict, indexed: Iterable[str] = ()) -> "SQLiteSheetStore":
+        """Mở lại phiên bản do to_json() mô tả (vd. do worker khác ghi)."""
+        return cls(db, value['version'], value['headers'], value['size'], indexed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def position(self, header: str) -> int:
+        try:
+            return self._positions[header]
+        except KeyError:
+            raise ValueError(f"Không có cột: {header}") from None
+
+    def lookup(self, header: str, value: str) -> Sequence[int]:
+        position = self.position(header)
+        key = normalize_value(value)
+        if not key:
+            return []
+        conn = self.db.connect()
+        if header in self.indexed:
+            return [row for (row,) in conn.execute(
+                "SELECT row FROM sheet_keys WHERE version = ? AND header = ? AND value = ? ORDER BY row",
+                (self.version, header, key))]
+        # Cột không có chỉ mục: lấy cả cột (theo thứ tự dòng) trong một bước rồi lọc.
+        (column,) = conn.execute(
+            "SELECT json_group_array(json_extract(cells, ?)) FROM "
+            "(SELECT cells FROM sheet_rows WHERE version = ? ORDER BY row)",
+            (f"$[{position}]", self.version)).fetchone()
+        return [i for i, cell in enumerate(json.loads(column)) if normalize_value(cell or '') == key]
+
+    def lookup_many(self, header: str, values: Iterable[str]) -> Dict[str, Sequence[int]]:
+        keys = {normalize_value(value) for value in values}
+        if header not in self.indexed:
+            return {key: self.lookup(header, key) for key in keys}
+        self.position(header)
+        result: Dict[str, List[int]] = {key: [] for key in keys}
+        wanted = [key for key in keys if key]
+        conn = self.db.connect()
+        for start in range(0, len(wanted), SQLITE_MAX_PARAMS):
+            chunk = wanted[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            (found,) = conn.execute(
+                f"SELECT json_group_array(json_array(value, row)) FROM "
+                f"(SELECT value, row FROM sheet_keys WHERE version = ? AND header = ? "
+                f"AND value IN ({placeholders}) ORDER BY row)", (self.version, header, *chunk)).fetchone()
+            for value, row in json.loads(found):
+                result[value].append(row)
+        return result
+
+    def select(self, filters: Dict[str, str]) -> List[int]:
+        if not filters:
+            return list(range(self.size))
+        matches = sorted((self.lookup(header, value) for header, value in filters.items()), key=len)
+        result = set(matches[0])
+        for rows in matches[1:]:
+            result.intersection_update(rows)
+        return sorted(result)
+
+    def rows(self, row_ids: Sequence[int]) -> List[List[str]]:
+        found: Dict[int, List[str]] = {}
+        conn = self.db.connect()
+        for start in range(0, len(row_ids), SQLITE_MAX_PARAMS):
+            chunk = list(row_ids[start:start + SQLITE_MAX_PARAMS])
+            placeholders = ",".join("?" * len(chunk))
+            # cells đã là JSON: nối thẳng, không để SQLite phân tích lại từng dòng.
+            rows, cells = conn.execute(
+                f"SELECT group_concat(row), '[' || group_concat(cells) || ']' FROM sheet_rows "
+                f"WHERE version = ? AND row IN ({placeholders})", (self.version, *chunk)).fetchone()
+            if rows:
+                found.update(zip(map(int, rows.split(',')), json.loads(cells)))
+        return [found[i] for i in row_ids if i in found]
+
+    def records(self, row_ids: Sequence[int]) -> List[Dict[str, str]]:
+        return [dict(zip(self.headers, row)) for row in self.rows(row_ids)]
+
+    def record(self, i: int) -> Dict[str, str]:
+        return self.records([i])[0]
+
+    def row(self, i: int) -> List[str]:
+        return self.rows([i])[0]
+
+    def set_value(self, i: int, header: str, value: str) -> bool:
+        if header not in self._positions or not 0 <= i < self.size:
+            return False
+        position = self._positions[header]
+        with self.db.connect() as conn:
+            found = conn.execute("SELECT cells FROM sheet_rows WHERE version = ? AND row = ?",
+                                 (self.version, i)).fetchone()
+            if found is None:
+                return False
+            cells = json.loads(found[0])
+            old, cells[position] = cells[position], value
+            conn.execute("UPDATE sheet_rows SET cells = ? WHERE version = ? AND row = ?",
+                         (json.dumps(cells, ensure_ascii=False), self.version, i))
+            if header in self.indexed:
+                conn.execute("DELETE FROM sheet_keys WHERE version = ? AND header = ? AND value = ? AND row = ?",
+                             (self.version, header, normalize_value(old), i))
+                if normalize_value(value):
+                    conn.execute("INSERT INTO sheet_keys (version, header, value, row) VALUES (?, ?, ?, ?)",
+                                 (self.version, header, normalize_value(value), i))
+        return True
+
+    def to_json(self) -> dict:
+        return {'version': self.version, 'headers': self.headers, 'size': self.size}
@@ -1,92 +1,555 @@
+import asyncio
 import os
-from typing import List, Dict, Any
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
 from googleapiclient.errors import HttpError
 
+from src import outbound
+from src.cache_backend import CacheBackend, MemoryBackend, SQLiteBackend, get_cache_backend
+from src.sheet_store import SQLITE_SCHEMA, ColumnStore, SQLiteSheetStore
+from src.sqlite_db import SQLiteDatabase
+from src.metrics import CACHE_REQUESTS, SHEETS_CALL_SECONDS, Gauge, track_upstream
+from src.outbound import CircuitOpenError, OUTBOUND_READ_TIMEOUT_SECONDS, OUTBOUND_RETRIES
+
 SERVICE_ACCOUNT_FILE = 'credentials.json'
 ACTIVITY_SHEET_ID = '1BGbTI34I8H_cZaRey5UHuPkxZa1bMsk1JanXCZFdj3s'
 CERTIFICATE_SHEET_ID = '1uAVk9XZExLgCdfukYGxk8NSFh5CZtrfjS0gQtxjTQaQ'
 SHEET_NAME = 'Sheet1'
 
+READONLY_SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+READWRITE_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+DRIVE_METADATA_SCOPES = ['https://www.googleapis.com/auth/drive.metadata.readonly']
+
+# Chỉ mục CCCD được nạp lại toàn bộ sau TTL, hoặc sớm hơn nếu sheet bị sửa
+# (kiểm tra modifiedTime qua Drive API, tối đa mỗi SHEET_INDEX_CHECK_SECONDS).
+SHEET_INDEX_TTL_SECONDS = int(os.getenv('SHEET_INDEX_TTL_SECONDS', '300'))
+# Các cột được dựng sẵn chỉ mục phụ để lọc nhanh (ngoài CCCD); cột khác dựng khi cần.
+SHEET_INDEXED_COLUMNS = ['CCCD'] + [
+    header.strip() for header in os.getenv('SHEET_INDEXED_COLUMNS', 'Hoạt động,Ngày').split(',') if header.strip()]
+SHEET_INDEX_CHECK_SECONDS = int(os.getenv('SHEET_INDEX_CHECK_SECONDS', '15'))
+
+# Yêu cầu PDF được gom lại và ghi một lần sau PDF_WRITE_FLUSH_MS hoặc khi đủ PDF_WRITE_MAX_BATCH.
+PDF_REQUESTED_COLUMN = 'G'
+PDF_WRITE_FLUSH_MS = int(os.getenv('PDF_WRITE_FLUSH_MS', '100'))
+PDF_WRITE_MAX_BATCH = int(os.getenv('PDF_WRITE_MAX_BATCH', '200'))
+PDF_WRITE_TIMEOUT_SECONDS = 60
+
+# Host của từng upstream Google, dùng làm khóa circuit breaker (src/outbound.py).
+GOOGLE_HOSTS = {'sheets': 'sheets.googleapis.com', 'drive': 'www.googleapis.com'}
+# Các lời gọi đọc được googleapiclient tự thử lại (backoff có jitter) khi gặp 5xx/429/lỗi mạng.
+SHEETS_READ_RETRIES = OUTBOUND_RETRIES
+
+
+# Mỗi bộ scope có một client dùng chung cho toàn tiến trình. httplib2.Http không
+# an toàn đa luồng, nên mỗi luồng của threadpool giữ một AuthorizedHttp riêng
+# (giữ kết nối keep-alive) nhưng dùng chung credentials để token chỉ làm mới một lần.
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
+_thread_local = threading.local()
+
+# googleapiclient.discovery, google.oauth2 và httplib2 mất vài trăm ms để import:
+# chỉ import khi dựng client lần đầu (hoặc khi prewarm chạy nền), không phải lúc
+# worker khởi động.
+
+
+def _thread_http(key: tuple, creds):
+    import google_auth_httplib2
+    import httplib2
+
+    https = getattr(_thread_local, 'https', None)
+    if https is None:
+        https = _thread_local.https = {}
+    http = https.get(key)
+    if http is None:
+        # httplib2 chỉ có một timeout socket, áp cho cả kết nối lẫn mỗi lần đọc.
+        http = https[key] = google_auth_httplib2.AuthorizedHttp(
+            creds, http=httplib2.Http(timeout=OUTBOUND_READ_TIMEOUT_SECONDS))
+    return http
+
+
+def _get_client(scopes: List[str], service_name: str, version: str):
+    key = (service_name, version) + tuple(sorted(scopes))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if not os.path.exists(SERVICE_ACCOUNT_FILE):
+                raise FileNotFoundError(f"File '{SERVICE_ACCOUNT_FILE}' không tồn tại.")
+            from google.oauth2 import service_account
+            from googleapiclient.discovery import build
+            from googleapiclient.http import HttpRequest
+
+            creds = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=scopes)
+
+            def request_builder(http, *args, **kwargs):
+                return HttpRequest(_thread_http(key, creds), *args, **kwargs)
+
+            client = build(service_name, version,
+                           http=_thread_http(key, creds),
+                           requestBuilder=request_builder)
+            _clients[key] = client
+    return client
+
 
 def get_sheet_api(scopes: List[str]):
-    if not os.path.exists(SERVICE_ACCOUNT_FILE):
-        raise FileNotFoundError(f"File '{SERVICE_ACCOUNT_FILE}' không tồn tại.")
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=scopes)
-    service = build('sheets', 'v4', credentials=creds)
-    return service.spreadsheets()
+    # Dựng resource spreadsheets() cũng tốn vài chục ms, nên giữ lại luôn.
+    key = ('spreadsheets',) + tuple(sorted(scopes))
+    api = _clients.get(key)
+    if api is None:
+        api = _clients.setdefault(key, _get_client(scopes, 'sheets', 'v4').spreadsheets())
+    return api
 
 
-def _search_one_sheet(sheet_api, spreadsheet_id: str, citizen_id: str):
-    try:
-        result = sheet_api.values().get(spreadsheetId=spreadsheet_id, range=SHEET_NAME).execute()
-        values = result.get('values', [])
+def sheet_api_ready() -> bool:
+    # Client có thể được dựng lúc prewarm hoặc ở request đầu tiên cần Sheets.
+    return any(key[0] == 'spreadsheets' for key in list(_clients))
+
+
+def normalize_cccd(value: str) -> str:
+    return value.strip()
 
-        if not values or len(values) < 2:
-            return None
 
-        headers = values[0]
-        cccd_index = headers.index('CCCD')
+_modified_time_supported = True
 
-        for row in values[1:]:
-            if len(row) > cccd_index:
-                if row[cccd_index].strip() == citizen_id.strip():
-                    return {headers[i]: (row[i] if i < len(row) else '') for i in range(len(headers))}
 
+def _is_google_failure(e: BaseException) -> bool:
+    """5xx/429 và lỗi mạng/timeout là lỗi của upstream; 4xx khác (quyền, sai range) thì không."""
+    if isinstance(e, HttpError):
+        return e.resp.status >= 500 or e.resp.status == 429
+    return True
+
+
+@contextmanager
+def sheets_call(operation: str, upstream: str = 'sheets'):
+    """Một lời gọi API Google: qua circuit breaker của host, đo thời gian/lỗi cho /metrics.
+
+    Ném CircuitOpenError ngay (không gọi mạng) khi host đang bị ngắt mạch.
+    """
+    with outbound.guard(GOOGLE_HOSTS[upstream], _is_google_failure), \
+            track_upstream(SHEETS_CALL_SECONDS, upstream, operation=operation):
+        yield
+
+
+def _get_modified_time(spreadsheet_id: str) -> Optional[str]:
+    """Lấy modifiedTime của file qua Drive API; trả về None nếu không hỗ trợ."""
+    global _modified_time_supported
+    if not _modified_time_supported:
         return None
+    try:
+        drive_api = _get_client(DRIVE_METADATA_SCOPES, 'drive', 'v3')
+        with sheets_call('drive_modified_time', upstream='drive'):
+            meta = drive_api.files().get(fileId=spreadsheet_id, fields='modifiedTime').execute(
+                num_retries=SHEETS_READ_RETRIES)
+        return meta.get('modifiedTime')
+    except Exception as e:
+        if isinstance(e, CircuitOpenError) or (isinstance(e, HttpError) and _is_google_failure(e)):
+            # Drive tạm thời lỗi: lần này bỏ qua, không tắt hẳn việc kiểm tra.
+            return None
+        # Drive API chưa bật hoặc không có quyền: chỉ dựa vào TTL.
+        print(f"⚠️ Không lấy được modifiedTime, chỉ làm mới chỉ mục theo TTL: {e}")
+        _modified_time_supported = False
+        return None
+
+
+class SheetIndex:
+    """Bản sao của một spreadsheet kèm chỉ mục CCCD (đã chuẩn hóa) và các chỉ mục phụ,
+    được làm mới theo TTL/modifiedTime.
+
+    Với backend SQLite, dữ liệu nằm trong file cache dùng chung (SQLiteSheetStore):
+    một worker đọc sheet và ghi một lần, mọi worker tra cứu trên đó, nên cả lượt gọi
+    Sheets lẫn bộ nhớ không tăng theo số worker. Với backend khác, mỗi tiến trình
+    giữ một ColumnStore trong bộ nhớ."""
+
+    def __init__(self, spreadsheet_id: str,
+                 ttl_seconds: int = SHEET_INDEX_TTL_SECONDS,
+                 check_seconds: int = SHEET_INDEX_CHECK_SECONDS,
+                 backend: Optional[CacheBackend] = None):
+        self.spreadsheet_id = spreadsheet_id
+        self.backend = backend or MemoryBackend()
+        self.shared_key = f'sheet_index:v3:{spreadsheet_id}'
+        self.db: Optional[SQLiteDatabase] = None
+        if isinstance(self.backend, SQLiteBackend):
+            try:
+                self.db = SQLiteDatabase(self.backend.path, schema=SQLITE_SCHEMA)
+            except sqlite3.Error as e:
+                print(f"⚠️ Không mở được bảng sheet dùng chung, giữ dữ liệu trong bộ nhớ: {e}")
+        self.ttl_seconds = ttl_seconds
+        self.check_seconds = check_seconds
+        self.table: Union[ColumnStore, SQLiteSheetStore] = ColumnStore([], [])
+        self.modified_time: Optional[str] = None
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.invalidated_at = 0.0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _adopt_shared(self, item: Optional[tuple], modified_time: Optional[str]) -> bool:
+        """Dùng bản do worker khác đọc (qua backend) nếu nó còn mới và đúng phiên bản sheet."""
+        if item is None:
+            return False
+        value, stored_at = item
+        if (stored_at <= max(self.loaded_at, self.invalidated_at)
+                or time.time() - stored_at >= self.ttl_seconds
+                or (modified_time is not None and value['modified_time'] != modified_time)):
+            return False
+        if 'version' in value:
+            if self.db is None:
+                return False
+            table = SQLiteSheetStore.from_json(self.db, value, SHEET_INDEXED_COLUMNS)
+        else:
+            table = ColumnStore.from_json(value, SHEET_INDEXED_COLUMNS)
+        self._set(table, value['modified_time'], stored_at)
+        return True
+
+    def _build_table(self, headers: List[str], rows: List[List[str]]) -> Union[ColumnStore, SQLiteSheetStore]:
+        if self.db is not None:
+            try:
+                return SQLiteSheetStore.create(self.db, self.spreadsheet_id, headers, rows, SHEET_INDEXED_COLUMNS)
+            except sqlite3.Error as e:
+                print(f"⚠️ Lỗi ghi sheet {self.spreadsheet_id} vào cache dùng chung, giữ trong bộ nhớ: {e}")
+        return ColumnStore.from_rows(headers, rows, SHEET_INDEXED_COLUMNS)
+
+    def _load(self, sheet_api):
+        modified_time = _get_modified_time(self.spreadsheet_id)
+        if self._adopt_shared(self.backend.get(self.shared_key), modified_time):
+            CACHE_REQUESTS.inc(cache='sheet_index', result='shared')
+            return
+        with self.backend.lock(self.shared_key) as acquired:
+            if not acquired:
+                # Worker khác đang đọc sheet: chờ kết quả thay vì đọc thêm một lần.
+                item = self.backend.wait_for(self.shared_key, max(self.loaded_at, self.invalidated_at))
+                if self._adopt_shared(item, modified_time):
+                    CACHE_REQUESTS.inc(cache='sheet_index', result='shared')
+                    return
+            CACHE_REQUESTS.inc(cache='sheet_index', result='reload')
+            with sheets_call('read_sheet'):
+                result = sheet_api.values().get(spreadsheetId=self.spreadsheet_id, range=SHEET_NAME).execute(
+                    num_retries=SHEETS_READ_RETRIES)
+            values = result.get('values', [])
+            headers = values[0] if values else []
+            if len(values) > 1 and 'CCCD' not in headers:
+                raise ValueError("Sheet không có cột 'CCCD'.")
+            table = self._build_table(headers, values[1:])
+            del values, result
+            loaded_at = time.time()
+            self._set(table, modified_time, loaded_at)
+            self.backend.set(self.shared_key, {**table.to_json(), 'modified_time': modified_time}, loaded_at)
+
+    def _set(self, table: ColumnStore, modified_time: Optional[str], loaded_at: float):
+        with self._lock:
+            self.table = table
+            self.modified_time = modified_time
+            self.loaded_at = loaded_at
+            self.checked_at = time.time()
+
+    def _needs_refresh(self) -> bool:
+        now = time.time()
+        if now < self.retry_at:
+            return False
+        if not self.loaded_at or now - self.loaded_at >= self.ttl_seconds:
+            return True
+        if now - self.checked_at < self.check_seconds:
+            return False
+        self.checked_at = now
+        modified_time = _get_modified_time(self.spreadsheet_id)
+        return modified_time is not None and modified_time != self.modified_time
+
+    def ensure_fresh(self, sheet_api):
+        """Nạp lại chỉ mục khi cần. Chỉ một luồng đọc sheet; các luồng khác dùng
+        dữ liệu cũ nếu đã có, hoặc chờ lần nạp đầu tiên."""
+        if self.loaded_at and not self._refresh_lock.acquire(blocking=False):
+            return
+        if not self.loaded_at:
+            self._refresh_lock.acquire()
+        try:
+            if self._needs_refresh():
+                self._load(sheet_api)
+        except Exception as e:
+            transient = isinstance(e, CircuitOpenError) or (not isinstance(e, ValueError) and _is_google_failure(e))
+            if not self.table.size or not transient:
+                raise
+            # Google lỗi nhưng đã có bản cũ: tiếp tục phục vụ bản đó, thử lại sau check_seconds.
+            print(f"⚠️ Không nạp lại được sheet {self.spreadsheet_id}, dùng bản cũ: {e}")
+            CACHE_REQUESTS.inc(cache='sheet_index', result='stale_fallback')
+            self.retry_at = time.time() + self.check_seconds
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self):
+        self.invalidated_at = time.time()
+        self.loaded_at = 0.0
+        self.retry_at = 0.0
+
+    @contextmanager
+    def _reading(self) -> Iterator[Union[ColumnStore, SQLiteSheetStore]]:
+        """Bảng hiện tại. ColumnStore bị set_value sửa tại chỗ nên chỉ dùng dưới khóa;
+        SQLiteSheetStore (mỗi luồng một kết nối) thì không giữ khóa trong lúc truy vấn."""
+        with self._lock:
+            table = self.table
+            if isinstance(table, ColumnStore):
+                yield table
+                return
+        yield table
+
+    @property
+    def headers(self) -> List[str]:
+        return self.table.headers
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def row_numbers(self, citizen_id: str) -> List[int]:
+        """Số dòng (1-based, tính cả dòng tiêu đề) của các bản ghi khớp CCCD."""
+        with self._reading() as table:
+            return [i + 2 for i in table.lookup('CCCD', citizen_id)] if table.size else []
+
+    def find(self, citizen_id: str) -> Optional[Dict[str, str]]:
+        with self._reading() as table:
+            matches = table.lookup('CCCD', citizen_id) if table.size else []
+            return table.records(matches[:1])[0] if matches else None
+
+    def find_many(self, citizen_ids: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """Tất cả bản ghi khớp của từng CCCD (đã chuẩn hóa), trên cùng một phiên bản chỉ mục."""
+        with self._reading() as table:
+            if not table.size:
+                return {cid: [] for cid in map(normalize_cccd, citizen_ids)}
+            matches = table.lookup_many('CCCD', citizen_ids)
+            row_ids = sorted({i for rows in matches.values() for i in rows})
+            records = dict(zip(row_ids, table.records(row_ids)))
+            return {cid: [records[i] for i in matches[cid]] for cid in map(normalize_cccd, citizen_ids)}
+
+    def select(self, filters: Dict[str, str]) -> List[int]:
+        """Các dòng (0-based) thỏa mọi điều kiện {tiêu đề: giá trị}; ném ValueError nếu sai tên cột."""
+        with self._reading() as table:
+            return table.select(filters)
+
+    def rows_for(self, row_ids: List[int]) -> List[List[str]]:
+        with self._reading() as table:
+            return table.rows(row_ids)
+
+    def set_value(self, row_number: int, header: str, value: str):
+        """Cập nhật một ô (trong bộ nhớ hoặc bảng dùng chung) sau khi đã ghi thành công lên sheet."""
+        with self._reading() as table:
+            table.set_value(row_number - 2, header, value)
+
+
+_sheet_indexes: Dict[str, SheetIndex] = {}
+_sheet_indexes_lock = threading.Lock()
+
+
+def _sheet_index_ages():
+    now = time.time()
+    with _sheet_indexes_lock:
+        return {(sid,): now - index.loaded_at for sid, index in _sheet_indexes.items() if index.loaded_at}
+
+
+Gauge('govolunteer_sheet_index_age_seconds', 'Tuổi của chỉ mục CCCD theo spreadsheet.',
+      ('spreadsheet',), callback=_sheet_index_ages)
+
+
+def get_sheet_index(spreadsheet_id: str) -> SheetIndex:
+    with _sheet_indexes_lock:
+        if spreadsheet_id not in _sheet_indexes:
+            _sheet_indexes[spreadsheet_id] = SheetIndex(spreadsheet_id, backend=get_cache_backend())
+        return _sheet_indexes[spreadsheet_id]
+
+
+def _search_one_sheet(sheet_api, spreadsheet_id: str, citizen_id: str):
+    try:
+        with SHEETS_CALL_SECONDS.time(operation='lookup'):
+            index = get_sheet_index(spreadsheet_id)
+            index.ensure_fresh(sheet_api)
+            return index.find(citizen_id)
     except HttpError as e:
         return {"error": f"Không thể truy cập Google Sheet. Mã lỗi: {e.resp.status}"}
+    except CircuitOpenError:
+        return {"error": "Google Sheets tạm thời không khả dụng, vui lòng thử lại sau."}
     except Exception as e:
         return {"error": "Lỗi máy chủ nội bộ khi xử lý sheet."}
 
 
 def find_activity_info(citizen_id: str):
-    sheet_api = get_sheet_api(['https://www.googleapis.com/auth/spreadsheets.readonly'])
+    sheet_api = get_sheet_api(READONLY_SCOPES)
     return _search_one_sheet(sheet_api, ACTIVITY_SHEET_ID, citizen_id)
 
 
 def find_certificate_info(citizen_id: str):
-    sheet_api = get_sheet_api(['https://www.googleapis.com/auth/spreadsheets.readonly'])
+    sheet_api = get_sheet_api(READONLY_SCOPES)
     return _search_one_sheet(sheet_api, CERTIFICATE_SHEET_ID, citizen_id)
 
 
-def update_pdf_requested(citizen_id: str, email: str):
-    sheet_api = get_sheet_api(['https://www.googleapis.com/auth/spreadsheets'])
+def find_many_in_sheet(spreadsheet_id: str, citizen_ids: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    """Tra nhiều CCCD trên một spreadsheet với tối đa một lần đọc sheet.
 
-    result = sheet_api.values().get(spreadsheetId=CERTIFICATE_SHEET_ID, range=SHEET_NAME).execute()
-    values = result.get('values', [])
+    Khác _search_one_sheet: trả về mọi dòng khớp và để lỗi (HttpError, ...) lan ra ngoài.
+    """
+    with SHEETS_CALL_SECONDS.time(operation='batch_lookup'):
+        index = get_sheet_index(spreadsheet_id)
+        index.ensure_fresh(get_sheet_api(READONLY_SCOPES))
+        return index.find_many(citizen_ids)
 
-    if not values or len(values) < 2:
-        return False
 
-    headers = values[0]
+def _column_letter(index: int) -> str:
+    """Đổi chỉ số cột (0-based) sang ký hiệu A1: 0 -> A, 25 -> Z, 26 -> AA."""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _write_pdf_requests(items: List[tuple]):
+    """Ghi một lô yêu cầu PDF: một lần batchGet kiểm tra dòng, một lần batchUpdate.
+
+    Mỗi phần tử là (citizen_id, email, future); future nhận True/False hoặc lỗi.
+    """
     try:
-        cccd_index = headers.index('CCCD')
-        email_index = headers.index('Email')
-        requested_col_letter = "G"  
-    except ValueError:
-        raise Exception("Thiếu cột 'CCCD' hoặc 'Email' trong sheet.")
-
-    for i, row in enumerate(values[1:], start=2):
-        if len(row) > cccd_index:
-            if row[cccd_index].strip() == citizen_id.strip():
-                email_cell = f"{SHEET_NAME}!{chr(65 + email_index)}{i}"
-                sheet_api.values().update(
+        index = get_sheet_index(CERTIFICATE_SHEET_ID)
+        index.ensure_fresh(get_sheet_api(READONLY_SCOPES))
+        if not len(index):
+            for _, _, future in items:
+                future.set_result(False)
+            return
+
+        headers = index.headers
+        try:
+            cccd_index = headers.index('CCCD')
+            email_index = headers.index('Email')
+        except ValueError:
+            raise Exception("Thiếu cột 'CCCD' hoặc 'Email' trong sheet.")
+        requested_index = ord(PDF_REQUESTED_COLUMN) - 65
+
+        def resolve(citizen_id):
+            rows = index.row_numbers(citizen_id)
+            return rows[0] if rows else None
+
+        targets = [resolve(citizen_id) for citizen_id, _, _ in items]
+
+        # Chỉ mục có thể cũ (dòng bị chèn/xóa): đọc đúng các ô CCCD cần ghi để kiểm tra.
+        sheet_api = get_sheet_api(READWRITE_SCOPES)
+        checked_rows = sorted({row for row in targets if row})
+        stale = False
+        if checked_rows:
+            cccd_col = _column_letter(cccd_index)
+            with sheets_call('verify_rows'):
+                result = sheet_api.values().batchGet(
                     spreadsheetId=CERTIFICATE_SHEET_ID,
-                    range=email_cell,
-                    valueInputOption="USER_ENTERED",
-                    body={"values": [[email]]}
-                ).execute()
+                    ranges=[f"{SHEET_NAME}!{cccd_col}{row}" for row in checked_rows],
+                ).execute(num_retries=SHEETS_READ_RETRIES)
+            actual = {
+                row: normalize_cccd((value_range.get('values') or [['']])[0][0])
+                for row, value_range in zip(checked_rows, result.get('valueRanges', []))
+            }
+            stale = any(
+                row and actual.get(row) != normalize_cccd(citizen_id)
+                for (citizen_id, _, _), row in zip(items, targets)
+            )
+        # CCCD chưa có trong chỉ mục có thể là dòng mới thêm (kể cả khi cả lô đều chưa có);
+        # nạp lại tối đa mỗi check_seconds.
+        stale = stale or (None in targets and time.time() - index.loaded_at >= index.check_seconds)
+        if stale:
+            index.invalidate()
+            index.ensure_fresh(get_sheet_api(READONLY_SCOPES))
+            targets = [resolve(citizen_id) for citizen_id, _, _ in items]
 
-                sheet_api.values().update(
+        data = []
+        for (_, email, _), row in zip(items, targets):
+            if row:
+                data.append({"range": f"{SHEET_NAME}!{_column_letter(email_index)}{row}", "values": [[email]]})
+                data.append({"range": f"{SHEET_NAME}!{PDF_REQUESTED_COLUMN}{row}", "values": [["TRUE"]]})
+        if data:
+            with sheets_call('write_cells'):
+                sheet_api.values().batchUpdate(
                     spreadsheetId=CERTIFICATE_SHEET_ID,
-                    range=f"{SHEET_NAME}!{requested_col_letter}{i}",
-                    valueInputOption="USER_ENTERED",
-                    body={"values": [["TRUE"]]}
+                    body={"valueInputOption": "USER_ENTERED", "data": data},
                 ).execute()
+    except Exception as e:
+        for _, _, future in items:
+            future.set_exception(e)
+        return
+
+    for (_, email, future), row in zip(items, targets):
+        if row:
+            index.set_value(row, 'Email', email)
+            if requested_index < len(headers):
+                index.set_value(row, headers[requested_index], "TRUE")
+        future.set_result(row is not None)
+
+
+class PdfRequestQueue:
+    """Gom các yêu cầu PDF đang chờ và ghi chúng trong một lần batchUpdate,
+    sau mỗi flush_ms mili giây hoặc khi đủ max_batch yêu cầu."""
+
+    def __init__(self, flush_ms: int = PDF_WRITE_FLUSH_MS, max_batch: int = PDF_WRITE_MAX_BATCH):
+        self.flush_ms = flush_ms
+        self.max_batch = max_batch
+        self._pending: List[tuple] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, citizen_id: str, email: str) -> Future:
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((citizen_id, email, future))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="pdf-request-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _next_batch(self) -> List[tuple]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.flush_ms / 1000
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            # Yêu cầu mà người gọi đã bỏ (hết thời gian chờ) trước khi lô được lấy ra thì
+            # không ghi nữa; từ đây future không hủy được, nên writer luôn đặt được kết quả.
+            batch = [item for item in self._next_batch() if item[2].set_running_or_notify_cancel()]
+            if batch:
+                _write_pdf_requests(batch)
+
+
+_pdf_request_queue = PdfRequestQueue()
+
+
+def update_pdf_requested(citizen_id: str, email: str):
+    with SHEETS_CALL_SECONDS.time(operation='update_pdf_requested'):
+        future = _pdf_request_queue.submit(citizen_id, email)
+        try:
+            return future.result(timeout=PDF_WRITE_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # Chỉ bỏ được yêu cầu chưa vào lô; lô đang ghi thì vẫn ghi xong.
+            future.cancel()
+            raise
 
-                return True  
 
-    return False  
\ No newline at end of file
+async def update_pdf_requested_async(citizen_id: str, email: str):
+    """Bản async của update_pdf_requested: chờ lô ghi mà không giữ luồng nào."""
+    with SHEETS_CALL_SECONDS.time(operation='update_pdf_requested'):
+        future = _pdf_request_queue.submit(citizen_id, email)
+        try:
+            # shield: hết giờ chờ không được hủy future mà writer sắp đặt kết quả.
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), PDF_WRITE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
@@ -0,0 +1,96 @@
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Any = None
+
+
+class SingleFlight:
+    """Gộp các lời gọi đồng thời cùng key thành một lần thực thi duy nhất.
+
+    Luồng đến trước chạy hàm; các luồng đến sau chờ và nhận chung kết quả
+    (hoặc chung lỗi). Thống kê được gom theo nhóm (phần tử đầu của key).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, group: str, field: str):
+        counters = self._stats.setdefault(group, {"calls": 0, "executions": 0, "coalesced": 0})
+        counters["calls"] += 1
+        counters[field] += 1
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def do(self, key: tuple, fn: Callable, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(str(key[0]), "executions" if leader else "coalesced")
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key: tuple, fn: Callable, *args):
+        """Bản asyncio của do(): fn là coroutine function, các coroutine trùng key chờ chung."""
+        with self._lock:
+            future = self._async_calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._async_calls[key] = asyncio.get_running_loop().create_future()
+            self._count(str(key[0]), "executions" if leader else "coalesced")
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn(*args)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # đánh dấu đã xử lý khi không có ai chờ
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[key]
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """Bọc fn để các lời gọi cùng tham số được gộp, key = (name, *args)."""
+        @functools.wraps(fn)
+        def wrapper(*args):
+            return self.do((name,) + args, fn, *args)
+        return wrapper
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {group: dict(counters) for group, counters in self._stats.items()}
@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+import brotli
+from fastapi import Request, Response
+
+from src.metrics import CACHE_REQUESTS
+
+# Mỗi lần cache được làm mới, dữ liệu được tuần tự hóa và nén sẵn một lần; request
+# nóng chỉ chọn đúng biến thể bytes và ghi ra socket.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+CACHE_CONTROL = "no-cache"
+
+
+class Snapshot:
+    """JSON đã tuần tự hóa sẵn của một entry, kèm bản gzip/brotli và ETag mạnh.
+
+    Mỗi content-coding là một biểu diễn khác nhau nên có ETag riêng: "<hash>",
+    "<hash>-gzip", "<hash>-br".
+    """
+
+    __slots__ = ("body", "gzip", "br", "digest")
+
+    def __init__(self, data: Any):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzip = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+        self.br = brotli.compress(self.body, quality=BROTLI_QUALITY)
+        self.digest = hashlib.sha256(self.body).hexdigest()[:32]
+
+    def etag(self, coding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{coding}"' if coding else f'"{self.digest}"'
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != coding:
+            continue
+        params = params.replace(" ", "")
+        if not params.startswith("q="):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _etag_matches(if_none_match: str, digest: str) -> bool:
+    # If-None-Match dùng so sánh yếu: bỏ tiền tố W/ và hậu tố coding, vì mọi biến
+    # thể nén của cùng một nội dung đều còn hợp lệ với client.
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        value = tag.strip().removeprefix("W/").strip('"')
+        if value.split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+def snapshot_response(snapshot: Snapshot, request: Request, age: float) -> Response:
+    """304 nếu client đã có đúng bản này, nếu không thì bytes nén theo Accept-Encoding."""
+    accept_encoding = request.headers.get("accept-encoding", "")
+    coding, body = None, snapshot.body
+    if _accepts(accept_encoding, "br"):
+        coding, body = "br", snapshot.br
+    elif _accepts(accept_encoding, "gzip"):
+        coding, body = "gzip", snapshot.gzip
+    headers = {
+        "ETag": snapshot.etag(coding),
+        "Age": str(int(age)),
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match: Optional[str] = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, snapshot.digest):
+        CACHE_REQUESTS.inc(cache="client_etag", result="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    if coding:
+        headers["Content-Encoding"] = coding
+    CACHE_REQUESTS.inc(cache="client_etag", result="full")
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable
+
+from src.config import CACHE_DIR
+
+# Một file SQLite (WAL) cho mọi dữ liệu cache trên đĩa (bài viết, cache dùng chung
+# giữa các worker), mỗi phần một bảng riêng.
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "cache.sqlite3")
+
+
+class SQLiteDatabase:
+    """Kết nối SQLite theo từng luồng tới một file, dùng chung được giữa các tiến trình."""
+
+    def __init__(self, path: str = CACHE_DB_PATH, schema: Iterable[str] = ()):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in schema:
+                conn.execute(statement)
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite3.Connection không dùng chung được giữa các luồng: mỗi luồng một kết nối.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA busy_timeout=5000")
+        return conn
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+from benchmarks.fake_sheets import FakeSheetsBackend, cccd_for
+from src import sheets_utils
+
+
+class PdfRequestQueueTimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeSheetsBackend(rows=50)
+        write = self.backend.write
+
+        def slow_write(*args):
+            time.sleep(0.6)
+            return write(*args)
+
+        self.backend.write = slow_write
+        api = self.backend.spreadsheets()
+        self.queue = sheets_utils.PdfRequestQueue(flush_ms=50)
+        for patcher in (
+            mock.patch.object(sheets_utils, "get_sheet_api", lambda scopes: api),
+            mock.patch.object(sheets_utils, "_modified_time_supported", False),
+            mock.patch.object(sheets_utils, "_pdf_request_queue", self.queue),
+            mock.patch.dict(sheets_utils._sheet_indexes, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def email_of(self, i: int) -> str:
+        return self.backend.sheet(sheets_utils.CERTIFICATE_SHEET_ID)[i][3]
+
+    def test_caller_times_out_while_batch_in_flight(self):
+        async def scenario():
+            other = self.queue.submit(cccd_for(2), "b@example.com")
+            with mock.patch.object(sheets_utils, "PDF_WRITE_TIMEOUT_SECONDS", 0.3):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await sheets_utils.update_pdf_requested_async(cccd_for(1), "a@example.com")
+            # Lô vẫn ghi xong: yêu cầu còn lại trong lô nhận kết quả, writer còn sống.
+            self.assertTrue(await asyncio.wrap_future(other))
+            self.assertTrue(await sheets_utils.update_pdf_requested_async(cccd_for(3), "c@example.com"))
+
+        asyncio.run(asyncio.wait_for(scenario(), 10))
+        self.assertTrue(self.queue._thread.is_alive())
+        self.assertEqual(self.email_of(1), "a@example.com")
+        self.assertEqual(self.email_of(2), "b@example.com")
+        self.assertEqual(self.email_of(3), "c@example.com")
+
+    def test_cancelled_request_is_not_written(self):
+        self.queue.submit(cccd_for(4), "d@example.com")
+        # Giữ writer bận với lô đầu để yêu cầu kế tiếp còn nằm trong hàng đợi khi bị hủy.
+        time.sleep(0.2)
+        pending = self.queue.submit(cccd_for(5), "e@example.com")
+        self.assertTrue(pending.cancel())
+        done = self.queue.submit(cccd_for(6), "f@example.com")
+        self.assertTrue(done.result(timeout=10))
+        self.assertEqual(self.email_of(5), "")
+        self.assertEqual(self.email_of(6), "f@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.fake_sheets import cccd_for, generate_rows
+from src.sheet_store import SQLITE_SCHEMA, ColumnStore, SQLiteSheetStore
+from src.sqlite_db import SQLiteDatabase
+
+INDEXED = ["CCCD", "Hoạt động"]
+
+
+class SQLiteSheetStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db = SQLiteDatabase(os.path.join(directory.name, "cache.sqlite3"), schema=SQLITE_SCHEMA)
+        values = generate_rows(300)
+        self.headers, self.rows = values[0], values[1:]
+        self.memory = ColumnStore.from_rows(self.headers, self.rows, INDEXED)
+        self.shared = SQLiteSheetStore.create(self.db, "sheet", self.headers, self.rows, INDEXED)
+
+    def test_matches_column_store(self):
+        for store in (self.shared, SQLiteSheetStore.from_json(self.db, self.shared.to_json(), INDEXED)):
+            self.assertEqual(len(store), len(self.memory))
+            for cid in (cccd_for(1), " " + cccd_for(49) + " ", "khong-co"):
+                self.assertEqual(list(store.lookup("CCCD", cid)), list(self.memory.lookup("CCCD", cid)))
+            for filters in ({}, {"Hoạt động": "Mùa hè xanh"}, {"Hoạt động": "Mùa hè xanh", "Ngày": "02/02/2024"},
+                            {"PDF_Requested": "FALSE"}):
+                self.assertEqual(store.select(filters), self.memory.select(filters))
+            wanted = [cccd_for(1), cccd_for(49) + " ", "khong-co", ""]
+            self.assertEqual({k: list(v) for k, v in store.lookup_many("CCCD", wanted).items()},
+                             {k: list(v) for k, v in self.memory.lookup_many("CCCD", wanted).items()})
+            ids = self.memory.lookup("CCCD", cccd_for(49))
+            self.assertEqual(store.records(ids), self.memory.records(ids))
+            self.assertEqual(store.rows([0, 5, 299, 400]), self.memory.rows([0, 5, 299, 400]))
+            with self.assertRaises(ValueError):
+                store.select({"Không có": "x"})
+
+    def test_set_value_updates_rows_and_index(self):
+        for store in (self.shared, self.memory):
+            self.assertTrue(store.set_value(3, "Hoạt động", "Mới"))
+            self.assertTrue(store.set_value(3, "Email", "a@example.com"))
+            self.assertEqual(list(store.lookup("Hoạt động", "Mới")), [3])
+            self.assertNotIn(3, store.select({"Hoạt động": self.rows[3][4]}))
+            self.assertEqual(store.records([3])[0]["Email"], "a@example.com")
+
+    def test_keeps_only_current_and_previous_version(self):
+        second = SQLiteSheetStore.create(self.db, "sheet", self.headers, self.rows, INDEXED)
+        third = SQLiteSheetStore.create(self.db, "sheet", self.headers, self.rows[:10], INDEXED)
+        self.assertEqual(self.shared.rows([0]), [])
+        self.assertEqual(second.rows([0]), self.memory.rows([0]))
+        self.assertEqual(len(third.select({})), 10)
+        self.assertEqual(third.select({"CCCD": cccd_for(20)}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()